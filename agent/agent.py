@@ -2,11 +2,18 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
-import json
+import sys
+import functools
+from dataclasses import dataclass
+import gzip
+import io
+import itertools
+import random
+import time
 from datetime import datetime, timezone
-import traceback
 import boto3
 import httpx
+import orjson
 from dotenv import load_dotenv
 
 from livekit import rtc, api
@@ -14,6 +21,7 @@ from livekit.agents import (
     Agent,
     AgentSession,
     JobContext,
+    JobProcess,
     WorkerOptions,
     cli,
     function_tool,
@@ -24,6 +32,10 @@ from livekit.agents import (
 from livekit.plugins import deepgram, elevenlabs, openai, silero
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
+if sys.platform != "win32":
+    import uvloop
+    uvloop.install()
+
 
 from datetime import datetime, timezone, timedelta
 
@@ -35,18 +47,56 @@ load_dotenv(".env")
 logger = logging.getLogger("inbound-agent")
 logger.setLevel(logging.INFO)
 
+def _env_flag(name: str, default: str = "true") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True, slots=True)
+class _Cfg:
+    """Environment configuration, read once at import."""
+    backend_url: str
+    agent_api_secret: str | None
+    hetzner_bucket: str | None
+    hetzner_endpoint: str | None
+    hetzner_access: str | None
+    hetzner_secret: str | None
+    hetzner_region: str
+    livekit_url: str | None
+    livekit_key: str | None
+    openai_key: str | None
+    deepgram_key: str | None
+    elevenlabs_key: str | None
+    upload_transcripts: bool
+    upload_recordings: bool
+    min_endpointing_delay: float
+    min_silence_duration: float
+    deepgram_endpointing_ms: int
+
+
 # Environment variables
-BACKEND_API_URL = os.getenv("BACKEND_API_URL", "https://backend.mrbot-ki.de/api")
-HETZNER_BUCKET_NAME = os.getenv("HETZNER_BUCKET_NAME")
-HETZNER_ENDPOINT = os.getenv("HETZNER_ENDPOINT_URL")
-HETZNER_ACCESS_KEY = os.getenv("HETZNER_ACCESS_KEY")
-HETZNER_SECRET_KEY = os.getenv("HETZNER_SECRET_KEY")
-AGENT_API_SECRET = os.getenv("AGENT_API_SECRET")
-UPLOAD_TRANSCRIPTS = os.getenv("UPLOAD_TRANSCRIPTS", "true").lower() in ("1", "true", "yes")
-UPLOAD_RECORDINGS = os.getenv("UPLOAD_RECORDINGS", "true").lower() in ("1", "true", "yes")
+CFG = _Cfg(
+    backend_url=os.getenv("BACKEND_API_URL", "https://backend.mrbot-ki.de/api"),
+    agent_api_secret=os.getenv("AGENT_API_SECRET"),
+    hetzner_bucket=os.getenv("HETZNER_BUCKET_NAME"),
+    hetzner_endpoint=os.getenv("HETZNER_ENDPOINT_URL"),
+    hetzner_access=os.getenv("HETZNER_ACCESS_KEY"),
+    hetzner_secret=os.getenv("HETZNER_SECRET_KEY"),
+    hetzner_region=os.getenv("HETZNER_REGION", "hel1"),
+    livekit_url=os.getenv("AGENT_URL"),
+    livekit_key=os.getenv("AGENT_API_KEY"),
+    openai_key=os.getenv("OPENAI_API_KEY"),
+    deepgram_key=os.getenv("DEEPGRAM_API_KEY"),
+    elevenlabs_key=os.getenv("ELEVENLABS_API_KEY"),
+    upload_transcripts=_env_flag("UPLOAD_TRANSCRIPTS"),
+    upload_recordings=_env_flag("UPLOAD_RECORDINGS"),
+    min_endpointing_delay=float(os.getenv("TURN_DETECTION_MIN_ENDPOINTING_DELAY", "0.2")),
+    min_silence_duration=float(os.getenv("TURN_DETECTION_MIN_SILENCE_DURATION", "0.8")),
+    deepgram_endpointing_ms=int(os.getenv("DEEPGRAM_ENDPOINTING_MS", "100")),
+)
 
-TURN_DETECTION_MIN_ENDPOINTING_DELAY = float(os.getenv("TURN_DETECTION_MIN_ENDPOINTING_DELAY", "0.5"))
-TURN_DETECTION_MIN_SILENCE_DURATION = float(os.getenv("TURN_DETECTION_MIN_SILENCE_DURATION", "0.8"))
+_HETZNER_CONFIGURED = all([CFG.hetzner_endpoint, CFG.hetzner_access, CFG.hetzner_secret, CFG.hetzner_bucket])
+if (CFG.upload_transcripts or CFG.upload_recordings) and not _HETZNER_CONFIGURED:
+    logger.error(" Hetzner Object Storage credentials missing - transcript/recording uploads will fail")
 
 
 VOICE_LIBRARY = {
@@ -114,10 +164,10 @@ def get_voice_id(voice_name: str) -> str:
     voice_id = VOICE_LIBRARY.get(voice_name)
     
     if voice_id:
-        logger.info(f" Using voice: {voice_name} ({voice_id})")
+        logger.info(" Using voice: %s (%s)", voice_name, voice_id)
         return voice_id
     
-    logger.warning(f" Voice '{voice_name}' not found, using Lea as fallback")
+    logger.warning(" Voice '%s' not found, using Lea as fallback", voice_name)
     return VOICE_LIBRARY["Lea"]
 
 GREETINGS = {
@@ -128,6 +178,14 @@ GREETINGS = {
     "it": "Ciao! Grazie per aver chiamato {owner_name}. Sono {agent_name}, il tuo assistente AI. Posso aiutarti con informazioni e prenotare appuntamenti. Come posso aiutarti oggi?",
     "es": "¡Hola! Gracias por llamar a {owner_name}. Soy {agent_name}, tu asistente de IA. Puedo ayudarte con información y reservar citas. ¿Cómo puedo ayudarte hoy?",
 }
+
+@functools.lru_cache(maxsize=512)
+def _greet(language: str, agent_name: str, owner_name: str) -> str:
+    return GREETINGS.get(language, GREETINGS["en"]).format(
+        agent_name=agent_name,
+        owner_name=owner_name
+    )
+
 FAREWELL_MESSAGES = {
     "en": "Thank you for calling! Have a great day. Goodbye!",
     "de": "Vielen Dank für Ihren Anruf! Einen schönen Tag noch. Auf Wiederhören!",
@@ -217,32 +275,73 @@ Step 7: ONLY AFTER collecting ALL information, call the book_appointment tool
 {context_from_backend}
 Remember: Your goal is to help customers efficiently while making them feel valued and understood."""
 
-async def _speak_status_update(ctx: RunContext, message: str, delay: float = 0.2):
-    """Speak a brief status update before performing an action."""
-    await asyncio.sleep(delay)
+async def _speak_status_update(ctx: RunContext, message: str):
+    """Speak a brief status update and wait until it has been played out."""
     await ctx.session.say(message, allow_interruptions=True)
-    await asyncio.sleep(0.1)
 
+@functools.lru_cache(maxsize=1)
 def get_s3_client():
-    """Initialize S3-compatible client for Hetzner Object Storage"""
-    if not all([HETZNER_ENDPOINT, HETZNER_ACCESS_KEY, HETZNER_SECRET_KEY]):
+    """Initialize S3-compatible client for Hetzner Object Storage (built once per process)"""
+    if not _HETZNER_CONFIGURED:
         raise RuntimeError("Missing Hetzner Object Storage credentials")
     
     return boto3.client(
         's3',
-        endpoint_url=HETZNER_ENDPOINT,
-        aws_access_key_id=HETZNER_ACCESS_KEY,
-        aws_secret_access_key=HETZNER_SECRET_KEY,
-        region_name=os.getenv("HETZNER_REGION", "hel1")
+        endpoint_url=CFG.hetzner_endpoint,
+        aws_access_key_id=CFG.hetzner_access,
+        aws_secret_access_key=CFG.hetzner_secret,
+        region_name=CFG.hetzner_region
     )
 
-async def send_status_to_backend(
+_HTTP: httpx.AsyncClient | None = None
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+async def get_http() -> httpx.AsyncClient:
+    """Shared keep-alive client for all backend calls made by this worker process."""
+    global _HTTP
+    if _HTTP is None or _HTTP.is_closed:
+        _HTTP = httpx.AsyncClient(
+            base_url=CFG.backend_url,
+            timeout=httpx.Timeout(5.0, connect=2.0),
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            http2=True,
+            headers={"Authorization": f"Bearer {CFG.agent_api_secret}"},
+        )
+    return _HTTP
+
+
+async def close_http():
+    global _HTTP
+    if _HTTP is not None:
+        await _HTTP.aclose()
+        _HTTP = None
+
+# Status and lifecycle events are delivered by a single background worker so
+# that call setup and teardown never wait on the backend.
+STATUS_FLUSH_TIMEOUT = 10.0
+_STATUS_QUEUE: asyncio.Queue | None = None
+_STATUS_WORKER: asyncio.Task | None = None
+
+
+def _enqueue_event(path: str, payload: dict, label: str):
+    global _STATUS_QUEUE, _STATUS_WORKER
+
+    if _STATUS_QUEUE is None:
+        _STATUS_QUEUE = asyncio.Queue()
+    if _STATUS_WORKER is None or _STATUS_WORKER.done():
+        _STATUS_WORKER = asyncio.create_task(_status_worker())
+
+    _STATUS_QUEUE.put_nowait((path, payload, label))
+
+
+def send_status_to_backend(
     call_id: str,
     status: str,
     agent_id: int = None,
     error_details: dict = None
 ):
-    """Send status with GUARANTEED delivery"""
+    """Queue a status event for GUARANTEED delivery (returns immediately)"""
     payload = {
         "call_id": call_id,
         "status": status,
@@ -252,127 +351,255 @@ async def send_status_to_backend(
    
     if status == "failed" and error_details:
         payload["error_details"] = error_details
-   
-    for attempt in range(3):
+
+    _enqueue_event("/agent/report-event", payload, f"status '{status}'")
+
+
+def send_lifecycle_to_backend(call_id: str, agent_id: int, events: list[dict]):
+    """
+    Queue several call lifecycle updates (started_at, recording, status) as
+    one /agent/call-lifecycle request, applied by the backend in one UPDATE.
+    """
+    payload = {
+        "call_id": call_id,
+        "agent_id": agent_id,
+        "events": events,
+    }
+    label = "lifecycle " + "+".join(event["type"] for event in events)
+    _enqueue_event("/agent/call-lifecycle", payload, label)
+
+
+async def _status_worker():
+    """Drain the event queue in order, retrying each event until it is delivered."""
+    while True:
+        path, payload, label = await _STATUS_QUEUE.get()
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.post(
-                    f"{BACKEND_API_URL}/agent/report-event",
-                    json=payload
-                )
-                if response.status_code == 200:
-                    logger.info(f" Status '{status}' sent for {call_id}")
-                    return
+            await _deliver_event(path, payload, label)
+        finally:
+            _STATUS_QUEUE.task_done()
+
+
+def _backoff(attempt: int, base: float = 0.2, cap: float = 60.0) -> float:
+    """Exponential backoff with a little jitter so retries from many calls don't line up."""
+    return min(cap, base * 2 ** attempt) + random.uniform(0, 0.1)
+
+
+async def _deliver_event(path: str, payload: dict, label: str):
+    call_id = payload["call_id"]
+
+    for attempt in itertools.count():
+        try:
+            client = await get_http()
+            response = await client.post(
+                path,
+                content=orjson.dumps(payload),
+                headers=_JSON_HEADERS,
+            )
+            if response.status_code == 200:
+                logger.info(" %s sent for %s", label, call_id)
+                return
+            if 400 <= response.status_code < 500 and response.status_code != 429:
+                logger.error(" Backend rejected %s for %s: %s %s", label, call_id, response.status_code, response.text)
+                return
+            logger.warning(" Backend returned %s for %s (attempt %s)", response.status_code, label, attempt + 1)
         except Exception as e:
-            if attempt == 2:
-                logger.error(f" Failed to send status after 3 attempts: {e}")
+            logger.warning(" Failed to send %s (attempt %s): %s", label, attempt + 1, e)
+
+        await asyncio.sleep(_backoff(attempt))
+
+
+async def flush_status_queue():
+    """Give queued status events a bounded amount of time to go out before the job exits."""
+    if _STATUS_QUEUE is None:
+        return
+    try:
+        await asyncio.wait_for(_STATUS_QUEUE.join(), timeout=STATUS_FLUSH_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.error(" %s status event(s) not delivered before shutdown", _STATUS_QUEUE.qsize())
+
+def _encode_transcript(transcript_obj: dict) -> bytes:
+    """
+    Serialize the transcript into a gzip stream one history item at a time,
+    so the full uncompressed JSON document is never held in memory.
+    """
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=5) as gz:
+        gz.write(b"{")
+        for i, (key, value) in enumerate(transcript_obj.items()):
+            if i:
+                gz.write(b",")
+            gz.write(orjson.dumps(key) + b":")
+            if isinstance(value, list):
+                gz.write(b"[")
+                for j, item in enumerate(value):
+                    if j:
+                        gz.write(b",")
+                    gz.write(orjson.dumps(item))
+                gz.write(b"]")
             else:
-                await asyncio.sleep(0.5)
+                gz.write(orjson.dumps(value))
+        gz.write(b"}")
+    return buf.getvalue()
+
+
+def put_transcript(blob_name: str, transcript_obj: dict):
+    """Upload a gzip-compressed JSON transcript to Hetzner Object Storage (blocking)."""
+    body = _encode_transcript(transcript_obj)
+    get_s3_client().put_object(
+        Bucket=CFG.hetzner_bucket,
+        Key=blob_name,
+        Body=body,
+        ContentType='application/json',
+        ContentEncoding='gzip'
+    )
 
 async def fetch_agent_config_from_backend(phone_number: str) -> dict | None:
     """Fetch agent configuration from backend API."""
-    if not BACKEND_API_URL or not AGENT_API_SECRET:
+    if not CFG.backend_url or not CFG.agent_api_secret:
         logger.error(" BACKEND_API_URL or AGENT_API_SECRET not configured")
         return None
     
     phone_number = phone_number.strip().strip('{}').strip()
     
     try:
-        logger.info(f" Fetching agent config from backend for: {phone_number}")
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{BACKEND_API_URL}/agent/config/{phone_number}",
-                headers={"Authorization": f"Bearer {AGENT_API_SECRET}"}
-            )
-            
-            if response.status_code == 403:
-                logger.error(f" Agent minutes exhausted for {phone_number}")
-                return None
-            
-            if response.status_code == 404:
-                logger.warning(f" No agent found for phone: {phone_number}")
-                return None
-            
-            if response.status_code != 200:
-                logger.error(f" Backend returned {response.status_code}: {response.text}")
-                return None
-            
-            data = response.json()
-            if not data.get("success"):
-                logger.error(f" Backend error: {data.get('error')}")
-                return None
-            
-            config = data.get("agent")
-            if not config:
-                logger.error(" No agent data in response")
-                return None
-            
-            logger.info(f" Agent config loaded: {config['agent_name']} (ID: {config.get('agent_id', config.get('id'))})")
-            return config
-            
+        logger.info(" Fetching agent config from backend for: %s", phone_number)
+        client = await get_http()
+        response = await client.get(
+            f"/agent/config/{phone_number}",
+            timeout=10.0
+        )
+        
+        if response.status_code == 403:
+            logger.error(" Agent minutes exhausted for %s", phone_number)
+            return None
+        
+        if response.status_code == 404:
+            logger.warning(" No agent found for phone: %s", phone_number)
+            return None
+        
+        if response.status_code != 200:
+            logger.error(" Backend returned %s: %s", response.status_code, response.text)
+            return None
+        
+        data = orjson.loads(response.content)
+        if not data.get("success"):
+            logger.error(" Backend error: %s", data.get('error'))
+            return None
+        
+        config = data.get("agent")
+        if not config:
+            logger.error(" No agent data in response")
+            return None
+        
+        logger.info(" Agent config loaded: %s (ID: %s)", config['agent_name'], config.get('agent_id') or config.get('id'))
+        return config
+        
     except httpx.TimeoutException:
-        logger.error(f" Timeout fetching agent config from backend")
+        logger.error(" Timeout fetching agent config from backend")
         return None
-    except Exception as e:
-        logger.error(f" Unexpected error fetching agent config: {e}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception(" Unexpected error fetching agent config")
         return None
 
+# Agent configs are reused for repeat calls to the same number within the TTL.
+AGENT_CONFIG_TTL = 60.0
+_CONFIG_CACHE: dict[str, tuple[float, dict]] = {}
+
+
+async def cached_agent_config(phone_number: str) -> dict | None:
+    """fetch_agent_config_from_backend with a short in-process TTL cache per phone number."""
+    now = time.monotonic()
+    hit = _CONFIG_CACHE.get(phone_number)
+    if hit and now - hit[0] < AGENT_CONFIG_TTL:
+        logger.info(" Using cached agent config for: %s", phone_number)
+        return hit[1]
+
+    config = await fetch_agent_config_from_backend(phone_number)
+    if config:
+        _CONFIG_CACHE[phone_number] = (now, config)
+    else:
+        _CONFIG_CACHE.pop(phone_number, None)
+    return config
+
 async def initialize_call_history(phone_number: str, call_id: str, caller_number: str = None) -> dict | None:
     """
     Fetch dynamic/new data for the agent based on phone number.
     NOW: Also creates call history record with caller_number.
     """
-    if not BACKEND_API_URL or not AGENT_API_SECRET:
+    if not CFG.backend_url or not CFG.agent_api_secret:
         logger.error(" BACKEND_API_URL or AGENT_API_SECRET not configured")
         return None
     
     phone_number = phone_number.strip().strip('{}').strip()
     
     try:
-        logger.info(f" Initializing call for phone: {phone_number}, caller: {caller_number}")
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(
-                f"{BACKEND_API_URL}/agent/new-call",
-                params={
-                    "phone_number": phone_number, 
-                    "call_id": call_id,
-                    "caller_number": caller_number
-                },
-                headers={"Authorization": f"Bearer {AGENT_API_SECRET}"}
-            )
-            
-            if response.status_code == 404:
-                logger.warning(f" No dynamic data found for phone: {phone_number}")
-                return None
-            
-            if response.status_code != 200:
-                logger.error(f" Backend returned {response.status_code}: {response.text}")
-                return None
-            
-            data = response.json()
-            if not data.get("success"):
-                logger.error(f" Backend error: {data.get('error')}")
-                return None
-            
-            dynamic_data = data.get("dynamic_data")
-            if not dynamic_data:
-                logger.info(" No dynamic data available")
-                return None
-            
-            logger.info(f" Dynamic data loaded")
-            return dynamic_data
-            
+        logger.info(" Initializing call for phone: %s, caller: %s", phone_number, caller_number)
+        client = await get_http()
+        response = await client.get(
+            "/agent/new-call",
+            timeout=10.0,
+            params={
+                "phone_number": phone_number, 
+                "call_id": call_id,
+                "caller_number": caller_number
+            }
+        )
+        
+        if response.status_code == 404:
+            logger.warning(" No dynamic data found for phone: %s", phone_number)
+            return None
+        
+        if response.status_code != 200:
+            logger.error(" Backend returned %s: %s", response.status_code, response.text)
+            return None
+        
+        data = orjson.loads(response.content)
+        if not data.get("success"):
+            logger.error(" Backend error: %s", data.get('error'))
+            return None
+        
+        dynamic_data = data.get("dynamic_data")
+        if not dynamic_data:
+            logger.info(" No dynamic data available")
+            return None
+        
+        logger.info(" Dynamic data loaded")
+        return dynamic_data
+        
     except httpx.TimeoutException:
-        logger.error(f" Timeout fetching dynamic data from backend")
+        logger.error(" Timeout fetching dynamic data from backend")
         return None
-    except Exception as e:
-        logger.error(f" Unexpected error fetching dynamic data: {e}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception(" Unexpected error fetching dynamic data")
         return None
 
 
 
+@functools.lru_cache(maxsize=512)
+def _render_static_prompt(
+    agent_name: str,
+    phone_number: str,
+    language: str,
+    industry: str,
+    owner_name: str,
+    context_from_backend: str,
+) -> str:
+    """
+    Render everything in the prompt that only depends on the agent config.
+    The date/time placeholders are left in place and filled per call.
+    """
+    return BASE_SYSTEM_PROMPT_TEMPLATE.format(
+        agent_name=agent_name,
+        phone_number=phone_number,
+        language=language.upper(),
+        industry=industry or "General",
+        owner_name=owner_name or "the company",
+        current_date="{current_date}",
+        current_time="{current_time}",
+        context_from_backend=context_from_backend or "",
+    )
+
+
 def build_complete_system_prompt(
     agent_name: str,
     phone_number: str,
@@ -385,25 +612,86 @@ def build_complete_system_prompt(
     Build complete system prompt by combining base rules with backend context.
     NOW: Includes current date and time in German timezone.
     """
-    from datetime import datetime, timezone, timedelta
-    
-    german_tz = timezone(timedelta(hours=1))  
     now = datetime.now(german_tz)
     current_date = now.strftime("%A, %B %d, %Y") 
     current_time = now.strftime("%H:%M")           
     
-    complete_prompt = BASE_SYSTEM_PROMPT_TEMPLATE.format(
-        agent_name=agent_name,
-        phone_number=phone_number,
-        language=language.upper(),
-        industry=industry or "General",
-        owner_name=owner_name or "the company",
-        current_date=current_date,
-        current_time=current_time,
-        context_from_backend=context_from_backend or "",
+    static_prompt = _render_static_prompt(
+        agent_name,
+        phone_number,
+        language,
+        industry,
+        owner_name,
+        context_from_backend,
     )
     
-    return complete_prompt
+    return (
+        static_prompt
+        .replace("{current_date}", current_date, 1)
+        .replace("{current_time}", current_time, 1)
+    )
+
+async def start_recording(ctx: JobContext, phone_number: str) -> tuple[str, str, str] | None:
+    """
+    Start an audio-only room composite egress into Hetzner Object Storage.
+    Returns (egress_id, blob_path, recording_url), or None if it could not be started.
+    """
+    try:
+        safe_phone = phone_number.replace("+", "").replace("-", "").replace(" ", "")
+        ts = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        recording_filename = f"recordings/{ctx.room.name}_{safe_phone}_{ts}.ogg"
+        
+        logger.info(" Starting recording: %s", recording_filename)
+        
+        livekit_endpoint = CFG.hetzner_endpoint.replace(f"{CFG.hetzner_bucket}.", "")
+        
+        logger.info(" LiveKit endpoint: %s", livekit_endpoint)
+        logger.info(" Using bucket: %s", CFG.hetzner_bucket)
+        
+        req = api.RoomCompositeEgressRequest(
+            room_name=ctx.room.name,
+            audio_only=True,
+            file_outputs=[
+                api.EncodedFileOutput(
+                    file_type=api.EncodedFileType.OGG,
+                    filepath=recording_filename,
+                    s3=api.S3Upload(
+                        access_key=CFG.hetzner_access,
+                        secret=CFG.hetzner_secret,
+                        region=CFG.hetzner_region,
+                        endpoint=livekit_endpoint,  
+                        bucket=CFG.hetzner_bucket,
+                        force_path_style=True  
+                    )
+                )
+            ],
+        )
+        
+        # The job context already holds a LiveKitAPI client built from the
+        # worker credentials (AGENT_URL / AGENT_API_KEY / AGENT_API_SECRET),
+        # so reuse it instead of opening a new HTTP client per call.
+        egress_resp = await ctx.api.egress.start_room_composite_egress(req)
+        recording_url = f"{CFG.hetzner_endpoint}/{recording_filename}"
+        
+        logger.info(" Recording started (egress_id: %s)", egress_resp.egress_id)
+        logger.info("Recording blob path: %s", recording_filename)
+        logger.info(" Recording URL: %s", recording_url)
+        
+        return egress_resp.egress_id, recording_filename, recording_url
+        
+    except Exception:
+        logger.exception(" Failed to start recording")
+        return None
+
+
+async def stop_recording(ctx: JobContext, egress_id: str):
+    """Stop an egress that was started for a call that will not be handled."""
+    try:
+        await ctx.api.egress.stop_egress(api.StopEgressRequest(egress_id=egress_id))
+        logger.info(" Recording stopped (egress_id: %s)", egress_id)
+    except Exception:
+        logger.exception(" Failed to stop recording")
+
 
 class InboundAgent(Agent):
     def __init__(self, *, agent_config: dict):
@@ -426,10 +714,10 @@ class InboundAgent(Agent):
             context_from_backend=context_from_backend
         )
         
-        logger.info(f" Initializing agent '{self.agent_name}'")
-        logger.info(f"   Language: {self.language}")
-        logger.info(f"   Industry: {self.industry}")
-        logger.info(f"   Owner email: {self.owner_email}")
+        logger.info(" Initializing agent '%s'", self.agent_name)
+        logger.info("   Language: %s", self.language)
+        logger.info("   Industry: %s", self.industry)
+        logger.info("   Owner email: %s", self.owner_email)
         
         super().__init__(instructions=complete_system_prompt)
         
@@ -457,7 +745,7 @@ class InboundAgent(Agent):
     def set_sip_participant_joined(self):
         """Record when SIP participant joins"""
         self.sip_participant_joined_at = datetime.now(timezone.utc)
-        logger.info(f" SIP participant joined at: {self.sip_participant_joined_at.isoformat()}")
+        logger.info(" SIP participant joined at: %s", self.sip_participant_joined_at.isoformat())
 
     def set_sip_participant_left(self):
         """Record when SIP participant leaves and calculate duration"""
@@ -469,11 +757,12 @@ class InboundAgent(Agent):
             ).total_seconds()
             
             logger.info(
-                f" SIP participant left at: {self.sip_participant_left_at.isoformat()}"
+                " SIP participant left at: %s", self.sip_participant_left_at.isoformat()
             )
             logger.info(
-                f" Call duration: {self.call_duration_seconds:.2f} seconds "
-                f"({self.call_duration_seconds / 60:.2f} minutes)"
+                " Call duration: %.2f seconds (%.2f minutes)",
+                self.call_duration_seconds,
+                self.call_duration_seconds / 60,
             )
         else:
             logger.warning(" SIP participant left but no join time recorded")
@@ -500,8 +789,8 @@ class InboundAgent(Agent):
         - customer_phone: Phone number
         """
         try:
-            logger.info(f" Booking appointment: {appointment_date} {start_time}-{end_time}")
-            logger.info(f"   Customer: {customer_name} ({customer_email})")
+            logger.info(" Booking appointment: %s %s-%s", appointment_date, start_time, end_time)
+            logger.info("   Customer: %s (%s)", customer_name, customer_email)
 
             payload = {
                 "user_id": self.agent_id, 
@@ -516,30 +805,30 @@ class InboundAgent(Agent):
                 "organizer_name": self.owner_name, 
             }
 
-            async with httpx.AsyncClient(timeout=20.0) as client:
-                response = await client.post(
-                    f"{BACKEND_API_URL}/agent/book-appointment",
-                    json=payload,
-                    headers={"Authorization": f"Bearer {AGENT_API_SECRET}"}
-                )
+            client = await get_http()
+            response = await client.post(
+                "/agent/book-appointment",
+                timeout=20.0,
+                content=orjson.dumps(payload),
+                headers=_JSON_HEADERS,
+            )
 
-                logger.info(f" Booking response: {response.status_code}")
+            logger.info(" Booking response: %s", response.status_code)
 
-                if response.status_code in (200, 201):
-                    data = response.json()
-                    if data.get("success"):
-                        return {
-                            "success": True,
-                            "message": f"Your appointment is confirmed for {appointment_date} at {start_time}. "
-                                    f"A confirmation email has been sent to {customer_email}."
-                        }
+            if response.status_code in (200, 201):
+                data = orjson.loads(response.content)
+                if data.get("success"):
+                    return {
+                        "success": True,
+                        "message": f"Your appointment is confirmed for {appointment_date} at {start_time}. "
+                                f"A confirmation email has been sent to {customer_email}."
+                    }
 
-                msg = response.json().get("message", "There was an issue booking the appointment.")
-                return {"success": False, "message": msg}
+            msg = orjson.loads(response.content).get("message", "There was an issue booking the appointment.")
+            return {"success": False, "message": msg}
 
-        except Exception as e:
-            logger.error(f" Error booking appointment: {e}")
-            traceback.print_exc()
+        except Exception:
+            logger.exception(" Error booking appointment")
             return {
                 "success": False,
                 "message": "I'm having trouble with the booking system. Could you please call back later?"
@@ -551,8 +840,8 @@ class InboundAgent(Agent):
         # Get farewell message in the correct language
         farewell_message = FAREWELL_MESSAGES.get(self.language, FAREWELL_MESSAGES["en"])
         
-        logger.info(f"Speaking farewell: {farewell_message}")
-        await _speak_status_update(ctx, farewell_message, delay=0.2)
+        logger.info("Speaking farewell: %s", farewell_message)
+        await _speak_status_update(ctx, farewell_message)
         await ctx.wait_for_playout()  # Wait for speech to finish
         
         logger.info("Ending call...")
@@ -561,22 +850,49 @@ class InboundAgent(Agent):
             try:
                 await job_ctx.api.room.delete_room(api.DeleteRoomRequest(room=job_ctx.room.name))
                 logger.info("Room deleted")
-                await send_status_to_backend(job_ctx.room.name, "completed", self.agent_id)
+                send_status_to_backend(job_ctx.room.name, "completed", self.agent_id)
             except Exception as e:
-                logger.warning(f"Failed to delete room: {e}")
+                logger.warning("Failed to delete room: %s", e)
         
         try:
             ctx.shutdown(reason="Call ended by agent")
         except:
             pass
 
+_TURN_DETECTOR: MultilingualModel | None = None
+
+
+def get_turn_detector() -> MultilingualModel:
+    """One turn detector per worker process instead of one per call."""
+    global _TURN_DETECTOR
+    if _TURN_DETECTOR is None:
+        _TURN_DETECTOR = MultilingualModel()
+    return _TURN_DETECTOR
+
+
+def load_vad() -> silero.VAD:
+    return silero.VAD.load(
+        min_silence_duration=0.5, 
+        min_speech_duration=0.2,  
+        activation_threshold=0.5, 
+    )
+
+
+def prewarm(proc: JobProcess):
+    """Load the Silero VAD model once when the job process starts."""
+    proc.userdata["vad"] = load_vad()
+
+
 async def entrypoint(ctx: JobContext):
     """Entrypoint for inbound calls."""
     logger.info("=" * 80)
-    logger.info(f" INBOUND CALL - Room: {ctx.room.name}")
+    logger.info(" INBOUND CALL - Room: %s", ctx.room.name)
     logger.info("=" * 80)
     
     await ctx.connect()
+    # Start waiting for the caller right away so nothing below (backend
+    # lookups, egress setup) delays noticing that the SIP leg has joined.
+    participant_task = asyncio.create_task(ctx.wait_for_participant())
     
     called_number = 'unknown'
     caller_number = 'unknown'
@@ -601,8 +917,8 @@ async def entrypoint(ctx: JobContext):
                 if caller_number != 'unknown' and '@' in caller_number:
                     caller_number = caller_number.split('@')[0].replace('sip:', '')
                 
-                logger.info(f" Called number (agent): {called_number}")
-                logger.info(f" Caller number (customer): {caller_number}")
+                logger.info(" Called number (agent): %s", called_number)
+                logger.info(" Caller number (customer): %s", caller_number)
                 
                 if called_number != 'unknown':
                     break
@@ -617,21 +933,35 @@ async def entrypoint(ctx: JobContext):
 
     if not phone_number or phone_number == 'unknown':
         logger.error(" Missing phone_number - cannot determine agent")
+        participant_task.cancel()
         return
 
-    logger.info(f" Agent phone number: {phone_number}")
-    logger.info(f" Customer phone number: {caller_number}")
+    logger.info(" Agent phone number: %s", phone_number)
+    logger.info(" Customer phone number: %s", caller_number)
 
-    config_task = asyncio.create_task(fetch_agent_config_from_backend(phone_number))
+    config_task = asyncio.create_task(cached_agent_config(phone_number))
     
     dynamic_task = asyncio.create_task(
         initialize_call_history(phone_number, ctx.room.name, caller_number)
     )
     
+    # The egress only needs the room name and phone number, so start it
+    # alongside the backend lookups instead of after them.
+    recording_task = None
+    if CFG.upload_recordings:
+        recording_task = asyncio.create_task(start_recording(ctx, phone_number))
+    else:
+        logger.info(" Recording disabled")
+    
     agent_config = await config_task
     
     if not agent_config:
-        logger.error(f" No agent configured or minutes exhausted for: {phone_number}")
+        logger.error(" No agent configured or minutes exhausted for: %s", phone_number)
+        participant_task.cancel()
+        if recording_task:
+            recording = await recording_task
+            if recording:
+                await stop_recording(ctx, recording[0])
         return
     
     await dynamic_task
@@ -641,63 +971,66 @@ async def entrypoint(ctx: JobContext):
     voice_name = agent_config.get("voice_type", "Lea")
     voice_id = get_voice_id(voice_name)
     
-    logger.info(f" Voice: {voice_name} ({voice_id})")
-    logger.info(f" Language: {language}")
-    logger.info(f" Agent ID: {agent_id}")
+    logger.info(" Voice: %s (%s)", voice_name, voice_id)
+    logger.info(" Language: %s", language)
+    logger.info(" Agent ID: %s", agent_id)
     
     agent = InboundAgent(agent_config=agent_config)
     agent.set_caller_phone(caller_number)
     
-    turn_detector = MultilingualModel()
+    turn_detector = get_turn_detector()
     
     session = AgentSession(
         llm=openai.LLM(
             model="gpt-4.1-mini",
-            api_key=os.getenv("OPENAI_API_KEY"),
+            api_key=CFG.openai_key,
             temperature=0.5,  
         ),
         stt=deepgram.STT(
-            api_key=os.getenv("DEEPGRAM_API_KEY"),
+            api_key=CFG.deepgram_key,
             model="nova-3",
             language=language,
+            # Room audio is streamed as raw 16 kHz mono PCM (linear16), so
+            # Deepgram never has to sniff a container format.
+            sample_rate=16000,
+            interim_results=True,
+            punctuate=True,
+            smart_format=True,
+            no_delay=True,
+            endpointing_ms=CFG.deepgram_endpointing_ms,
         ),
         tts=elevenlabs.TTS(
-            api_key=os.getenv("ELEVENLABS_API_KEY"),
+            api_key=CFG.elevenlabs_key,
             model="eleven_flash_v2_5",
-            voice_id=voice_id
-        ),
-        vad=silero.VAD.load(
-            min_silence_duration=0.5, 
-            min_speech_duration=0.2,  
-            activation_threshold=0.5, 
+            voice_id=voice_id,
+            # Start playback on smaller chunks and skip the MP3 decode step;
+            # 16 kHz PCM matches the telephony leg.
+            streaming_latency=3,
+            encoding="pcm_16000",
         ),
+        vad=ctx.proc.userdata.get("vad") or load_vad(),
         turn_detection=turn_detector,
-        min_endpointing_delay=TURN_DETECTION_MIN_ENDPOINTING_DELAY,
+        min_endpointing_delay=CFG.min_endpointing_delay,
     )
     
 
     async def upload_transcript():
         """Upload transcript to Hetzner Object Storage and send metadata to backend"""
-        if not UPLOAD_TRANSCRIPTS:
+        if not CFG.upload_transcripts:
             logger.info(" Transcript upload disabled")
             return
         try:
             transcript_obj = session.history.to_dict() if hasattr(session, 'history') else {"messages": []}
-            transcript_json = json.dumps(transcript_obj, indent=2)
             
             ts = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
             safe_phone = phone_number.replace("+", "").replace("-", "").replace(" ", "")
             blob_name = f"transcripts/{ctx.room.name}_{safe_phone}_{ts}.json"
             
-            s3_client = get_s3_client()
-            s3_client.put_object(
-                Bucket=HETZNER_BUCKET_NAME,
-                Key=blob_name,
-                Body=transcript_json.encode('utf-8'),
-                ContentType='application/json'
-            )
+            # Encoding, compression and the boto3 upload are all blocking;
+            # keep them off the event loop for the rest of teardown.
+            await asyncio.to_thread(put_transcript, blob_name, transcript_obj)
             
-            logger.info(f" Transcript uploaded: {blob_name}")
+            logger.info(" Transcript uploaded: %s", blob_name)
             
             payload = {
                 "call_id": ctx.room.name,
@@ -713,110 +1046,64 @@ async def entrypoint(ctx: JobContext):
             payload = {k: v for k, v in payload.items() if v is not None}
             
             logger.info(
-                f" Sending call data to backend: "
-                f"duration={agent.call_duration_seconds:.2f}s "
-                f"({agent.call_duration_seconds / 60:.2f} min)"
+                " Sending call data to backend: duration=%.2fs (%.2f min)",
+                agent.call_duration_seconds,
+                agent.call_duration_seconds / 60,
             )
             
             max_retries = 3
             for attempt in range(max_retries):
                 try:
-                    async with httpx.AsyncClient(timeout=60.0) as c:
-                        response = await c.post(
-                            f"{BACKEND_API_URL}/agent/save-call-data",
-                            json=payload,
-                            headers={"Authorization": f"Bearer {AGENT_API_SECRET}"}
-                        )
-                        if response.status_code == 200:
-                            logger.info(" Call data sent to backend successfully")
-                            break
-                        else:
-                            logger.warning(f" Backend returned {response.status_code}: {response.text}")
-                            if attempt < max_retries - 1:
-                                await asyncio.sleep(2)
+                    client = await get_http()
+                    response = await client.post(
+                        "/agent/save-call-data",
+                        timeout=60.0,
+                        content=orjson.dumps(payload),
+                        headers=_JSON_HEADERS,
+                    )
+                    if response.status_code == 200:
+                        logger.info(" Call data sent to backend successfully")
+                        break
+                    else:
+                        logger.warning(" Backend returned %s: %s", response.status_code, response.text)
+                        if attempt < max_retries - 1:
+                            await asyncio.sleep(_backoff(attempt, base=1.0))
                 except httpx.ReadTimeout:
                     if attempt < max_retries - 1:
-                        logger.warning(f" Timeout on attempt {attempt + 1}, retrying...")
-                        await asyncio.sleep(2)
+                        logger.warning(" Timeout on attempt %s, retrying...", attempt + 1)
+                        await asyncio.sleep(_backoff(attempt, base=1.0))
                     else:
-                        logger.error(f" Backend timeout after {max_retries} attempts")
-                except Exception as e:
-                    logger.error(f" Backend request failed: {e}")
-                    traceback.print_exc()
+                        logger.error(" Backend timeout after %s attempts", max_retries)
+                except Exception:
+                    logger.exception(" Backend request failed")
                     break
                     
-        except Exception as e:
-            logger.error(f" Transcript upload failed: {e}")
-            traceback.print_exc()
-    ctx.add_shutdown_callback(upload_transcript)
+        except Exception:
+            logger.exception(" Transcript upload failed")
+
+    async def on_shutdown():
+        # Run in order: the transcript upload and any queued status events
+        # still need the shared HTTP client, so it is closed last.
+        await upload_transcript()
+        await flush_status_queue()
+        await close_http()
+    ctx.add_shutdown_callback(on_shutdown)
     
-    await ctx.connect()
-    await send_status_to_backend(ctx.room.name, "initialized", agent_id)
+    send_status_to_backend(ctx.room.name, "initialized", agent_id)
     
-    if UPLOAD_RECORDINGS:
-        try:
-            safe_phone = phone_number.replace("+", "").replace("-", "").replace(" ", "")
-            ts = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
-            recording_filename = f"recordings/{ctx.room.name}_{safe_phone}_{ts}.ogg"
-            
-            agent.recording_blob_path = recording_filename
-            
-            logger.info(f" Starting recording: {recording_filename}")
-            
-            livekit_endpoint = HETZNER_ENDPOINT.replace(f"{HETZNER_BUCKET_NAME}.", "")
-            
-            logger.info(f" LiveKit endpoint: {livekit_endpoint}")
-            logger.info(f" Using bucket: {HETZNER_BUCKET_NAME}")
-            
-            req = api.RoomCompositeEgressRequest(
-                room_name=ctx.room.name,
-                audio_only=True,
-                file_outputs=[
-                    api.EncodedFileOutput(
-                        file_type=api.EncodedFileType.OGG,
-                        filepath=recording_filename,
-                        s3=api.S3Upload(
-                            access_key=HETZNER_ACCESS_KEY,
-                            secret=HETZNER_SECRET_KEY,
-                            region=os.getenv("HETZNER_REGION", "hel1"),
-                            endpoint=livekit_endpoint,  
-                            bucket=HETZNER_BUCKET_NAME,
-                            force_path_style=True  
-                        )
-                    )
-                ],
-            )
-            
-            lkapi = api.LiveKitAPI(
-                url=os.getenv("AGENT_URL", "").replace("wss://", "https://"),
-                api_key=os.getenv("AGENT_API_KEY"),
-                api_secret=os.getenv("AGENT_API_SECRET"),
-            )
-            
-            egress_resp = await lkapi.egress.start_room_composite_egress(req)
-            agent.egress_id = egress_resp.egress_id
-            
-            agent.recording_url = f"{HETZNER_ENDPOINT}/{recording_filename}"
-            
-            logger.info(f" Recording started (egress_id: {agent.egress_id})")
-            logger.info(f"Recording blob path: {agent.recording_blob_path}")
-            logger.info(f" Recording URL: {agent.recording_url}")
-            
-            await lkapi.aclose()
-            
-        except Exception as e:
-            logger.error(f" Failed to start recording: {e}")
-            traceback.print_exc()
-    else:
-        logger.info(" Recording disabled")
-                
+    def on_recording_started(task: asyncio.Task):
+        if not task.cancelled() and task.result():
+            agent.egress_id, agent.recording_blob_path, agent.recording_url = task.result()
+
+    if recording_task:
+        recording_task.add_done_callback(on_recording_started)
     
     try:
-        logger.info(f" Waiting for caller to join...")
+        logger.info(" Waiting for caller to join...")
         
-        participant = await ctx.wait_for_participant()
+        participant = await participant_task
         agent.set_participant(participant)
-        logger.info(f" Caller joined: {participant.identity}")
+        logger.info(" Caller joined: %s", participant.identity)
        
         agent.set_sip_participant_joined()
 
@@ -828,44 +1115,34 @@ async def entrypoint(ctx: JobContext):
                 logger.info(" SIP participant disconnected")
         started_at = datetime.now(timezone.utc).isoformat()
         
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                await client.post(
-                    f"{BACKEND_API_URL}/agent/update-call-started",
-                    json={
-                        "call_id": ctx.room.name,
-                        "agent_id": agent_id,
-                        "caller_number": caller_number,
-                        "started_at": started_at
-                    }
-                )
-                logger.info(f" Started_at timestamp set: {started_at}")
-        except Exception as e:
-            logger.warning(f" Could not set started_at: {e}")
+        # One backend request for everything known at this point; if the
+        # egress is still starting, its path goes out with save-call-data.
+        lifecycle_events = [
+            {"type": "started_at", "started_at": started_at, "caller_number": caller_number},
+            {"type": "status", "status": "connected"},
+        ]
+        if agent.recording_blob_path:
+            lifecycle_events.insert(0, {
+                "type": "recording_started",
+                "recording_blob": agent.recording_blob_path,
+                "recording_url": agent.recording_url,
+            })
+        send_lifecycle_to_backend(ctx.room.name, agent_id, lifecycle_events)
         
-        await send_status_to_backend(ctx.room.name, "connected", agent_id)
+        # start() returns once the session's audio input/output is wired to
+        # the room, so the greeting can be queued immediately afterwards.
+        await session.start(agent=agent, room=ctx.room, room_input_options=RoomInputOptions())
         
-        session_task = asyncio.create_task(
-            session.start(agent=agent, room=ctx.room, room_input_options=RoomInputOptions())
-        )
-        
-        await asyncio.sleep(0.5)
-        
-        greeting_template = GREETINGS.get(language, GREETINGS["en"])
-        greeting = greeting_template.format(
-            agent_name=agent.agent_name,
-            owner_name=agent.owner_name
-            )
+        greeting = _greet(language, agent.agent_name, agent.owner_name)
         
-        logger.info(f" Greeting in {language}: {greeting}")
+        logger.info(" Greeting in %s: %s", language, greeting)
         await session.say(greeting, allow_interruptions=True)
-        await session_task
-        logger.info(" Full session completed")
+        logger.info(" Greeting played")
         
     except Exception as e:
-        logger.error(f" Unexpected error: {e}")
+        logger.exception(" Unexpected error")
         
-        await send_status_to_backend(
+        send_status_to_backend(
             ctx.room.name,
             "failed",
             agent_id,
@@ -875,7 +1152,6 @@ async def entrypoint(ctx: JobContext):
             }
         )
         
-        traceback.print_exc()
         ctx.shutdown()
     finally:
         if not agent.sip_participant_left_at:
@@ -887,9 +1163,10 @@ if __name__ == "__main__":
     cli.run_app(
         WorkerOptions(
             entrypoint_fnc=entrypoint,
+            prewarm_fnc=prewarm,
             agent_name="inbound-agent",
-            ws_url=os.getenv("AGENT_URL"),
-            api_key=os.getenv("AGENT_API_KEY"),
-            api_secret=os.getenv("AGENT_API_SECRET"),
+            ws_url=CFG.livekit_url,
+            api_key=CFG.livekit_key,
+            api_secret=CFG.agent_api_secret,
         )
     )
\ No newline at end of file
@@ -1,14 +1,41 @@
-from .router import router
+import re
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from .router import router, db
+from src.utils.cache import response_cache
+from src.utils.log_queue import start_log_listener
+from src.utils.utils import avatar_delete_worker, AVATAR_MAX_BYTES
 from fastapi import HTTPException
-from fastapi.responses import JSONResponse
+from .responses import ORJSONResponse
 from urllib.request import Request
 from datetime import datetime
 
+# Agent create/update forms carry the avatar plus a handful of text fields
+AVATAR_FORM_PATH = re.compile(r"^/api/agents(/\d+)?/?$")
+AVATAR_FORM_MAX_BYTES = AVATAR_MAX_BYTES + 64 * 1024
+
+@asynccontextmanager
+async def lifespan(app):
+    log_listener = start_log_listener()
+    await db.open_async_pool()
+    avatar_deletes = asyncio.create_task(avatar_delete_worker())
+    try:
+        yield
+    finally:
+        avatar_deletes.cancel()
+        with suppress(asyncio.CancelledError):
+            await avatar_deletes
+        await response_cache.close()
+        await db.close_async_pool()
+        log_listener.stop()
+
 def create_app():
     from fastapi import FastAPI
     from fastapi.middleware.cors import CORSMiddleware
 
     app = FastAPI(
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse,
         title="Auth",
         description="Assist the user using the Knowledgebase",
         version="0.1.0",
@@ -28,6 +55,18 @@ def create_app():
         allow_headers=["*"],  # Allows all headers
     )
 
+    # Reject oversize avatar forms from Content-Length before any of the body is read
+    @app.middleware("http")
+    async def limit_avatar_form_size(request, call_next):
+        if request.method in ("POST", "PUT") and AVATAR_FORM_PATH.match(request.url.path):
+            content_length = request.headers.get("content-length")
+            if content_length and content_length.isdigit() and int(content_length) > AVATAR_FORM_MAX_BYTES:
+                return ORJSONResponse(
+                    status_code=413,
+                    content={"error": "File too large. Maximum size: 5MB"}
+                )
+        return await call_next(request)
+
     app.include_router(router, tags=["Auth"], prefix="/api")
 
     # Route Handlers
@@ -37,7 +76,7 @@ def create_app():
     
     @app.exception_handler(HTTPException)
     async def custom_http_exception_handler(request: Request, exc: HTTPException):
-        return JSONResponse(
+        return ORJSONResponse(
         status_code=exc.status_code,
         content={"error": exc.detail}  # ✅ frontend ke format mein
     )
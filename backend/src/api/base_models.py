@@ -1,16 +1,32 @@
-from pydantic import BaseModel, EmailStr, Field
-from typing import List, Optional,Dict,Literal
+import re
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, StringConstraints
+from typing import Annotated, List, Optional,Dict,Literal
 from datetime import datetime
 
 
+# 24h "HH:MM" (hour may be a single digit), shared by the models and the router's form validation
+HHMM_PATTERN = r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$'
+HHMM_RE = re.compile(HHMM_PATTERN)
+HHMM = Annotated[str, StringConstraints(pattern=HHMM_PATTERN)]
+
+
+class RequestModel(BaseModel):
+    """Base for inbound request bodies: immutable once parsed, surrounding whitespace trimmed."""
+    model_config = ConfigDict(frozen=True, str_strip_whitespace=True)
+
+
 ### =============== auth base model ====================
 
 class UserRegister(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     username: str
     email: EmailStr
     password: str
 
 class UserLogin(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     email: str  # We’ll use this to accept the username
     password: str
 
@@ -29,6 +45,8 @@ class LoginResponse(BaseModel):
     user: UserOut
 
 class UpdateUserProfileRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     # user_id: int
     first_name: Optional[str] = None
     last_name: Optional[str] = None
@@ -36,26 +54,13 @@ class UpdateUserProfileRequest(BaseModel):
     new_password: Optional[str] = None    
 
 
-class Assistant_Payload(BaseModel):
-    objective: str
-    context: str
-    # caller_number: str
-    caller_name: str
-    caller_number: str
-    caller_email: str
-    outbound_number : str
-    language : Literal['english', 'spanish']
-    voice : str
-    # outbound_number : str
-
-
-class CallDetailsPayload(BaseModel):
+class CallDetailsPayload(RequestModel):
     # user_id: int
     call_id: str
     voice_name : str
     # caller_email: EmailStr
 
-class Assistant_Payload(BaseModel):
+class Assistant_Payload(RequestModel):
     outbound_number: str      # Phone number to dial
     caller_name: str          # Your name/company name
     caller_email: str         # Your email (for sending calendar invites)
@@ -67,28 +72,28 @@ class Assistant_Payload(BaseModel):
 
 
 
-class PromptCustomizationUpdate(BaseModel):
+class PromptCustomizationUpdate(RequestModel):
     system_prompt: str = Field(..., min_length=10, max_length=10000)
 
 
 
 
-class CreateAgentRequest(BaseModel):
+class CreateAgentRequest(RequestModel):
     """Request model for creating a new agent"""
     agent_name: str = Field(..., min_length=1, max_length=100)
     phone_number: str = Field(..., min_length=10, max_length=20)
     system_prompt: str = Field(..., min_length=10)
-    voice_type: str = Field(..., pattern="^(male|female)$")
+    voice_type: Literal["male", "female"]
     language: Optional[str] = Field(default="en", max_length=10)
     industry: Optional[str] = Field(default=None, max_length=50)
     owner_name: Optional[str] = Field(default=None, max_length=100)
     owner_email: Optional[EmailStr] = Field(default=None)  # NEW
-    business_hours_start: Optional[str] = Field(default=None, pattern=r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$')  # NEW
-    business_hours_end: Optional[str] = Field(default=None, pattern=r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$')  # NEW
+    business_hours_start: Optional[HHMM] = None  # NEW
+    business_hours_end: Optional[HHMM] = None  # NEW
     allowed_minutes: Optional[int] = Field(default=0, ge=0)  # NEW
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "agent_name": "Customer Support Agent",
                 "phone_number": "+1234567890",
@@ -102,25 +107,26 @@ class CreateAgentRequest(BaseModel):
                 "business_hours_end": "17:00",
                 "allowed_minutes": 500
             }
-        }
+        },
+    )
 
 
-class UpdateAgentRequest(BaseModel):
+class UpdateAgentRequest(RequestModel):
     """Request model for updating an agent (all fields optional)"""
     agent_name: Optional[str] = Field(None, min_length=1, max_length=100)
     phone_number: Optional[str] = Field(None, min_length=10, max_length=20)
     system_prompt: Optional[str] = Field(None, min_length=10)
-    voice_type: Optional[str] = Field(None, pattern="^(male|female)$")
+    voice_type: Optional[Literal["male", "female"]] = None
     language: Optional[str] = Field(None, max_length=10)
     industry: Optional[str] = Field(None, max_length=50)
     owner_name: Optional[str] = Field(None, max_length=100)
     owner_email: Optional[EmailStr] = Field(None)  # NEW
-    business_hours_start: Optional[str] = Field(None, pattern=r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$')  # NEW
-    business_hours_end: Optional[str] = Field(None, pattern=r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$')  # NEW
+    business_hours_start: Optional[HHMM] = None  # NEW
+    business_hours_end: Optional[HHMM] = None  # NEW
     allowed_minutes: Optional[int] = Field(None, ge=0)  # NEW
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "agent_name": "Updated Agent Name",
                 "voice_type": "male",
@@ -131,31 +137,89 @@ class UpdateAgentRequest(BaseModel):
                 "business_hours_end": "18:00",
                 "allowed_minutes": 1000
             }
-        }
+        },
+    )
+
+
+class AvatarPresignRequest(RequestModel):
+    file_extension: Literal["jpg", "jpeg", "png", "gif", "webp"]
 
 
 # NEW: Model for reset minutes request
-class ResetAgentMinutesRequest(BaseModel):
+class ResetAgentMinutesRequest(RequestModel):
     """Request model for resetting agent minutes"""
     agent_id: int = Field(..., gt=0)
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "agent_id": 5
             }
-        }
+        },
+    )
 
-class ForgotPasswordRequest(BaseModel):
+class ForgotPasswordRequest(RequestModel):
     email: EmailStr
 
 class ResetPasswordRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     token: str
     new_password: str = Field(..., min_length=8)
 
 
-class ContactFormRequest(BaseModel):
+class ContactFormRequest(RequestModel):
     first_name: str
     last_name: str
     email: EmailStr
-    message: Optional[str] = None
\ No newline at end of file
+    message: Optional[str] = None
+
+### =============== agent webhook models ====================
+
+CallStatus = Literal["initialized", "dialing", "connected", "unanswered", "completed"]
+
+
+class AgentEvent(RequestModel):
+    call_id: str = Field(..., min_length=1)
+    status: CallStatus
+    agent_id: Optional[int] = None
+    timestamp: Optional[datetime] = None
+
+
+class CallStartedUpdate(RequestModel):
+    call_id: str = Field(..., min_length=1)
+    caller_number: Optional[str] = None
+    started_at: Optional[datetime] = None
+
+
+class CallRecordingUpdate(RequestModel):
+    call_id: str = Field(..., min_length=1)
+    recording_blob: Optional[str] = None
+    recording_url: Optional[str] = None
+
+
+class LifecycleEvent(RequestModel):
+    type: Literal["recording_started", "started_at", "status"]
+    recording_blob: Optional[str] = None
+    recording_url: Optional[str] = None
+    started_at: Optional[datetime] = None
+    caller_number: Optional[str] = None
+    status: Optional[CallStatus] = None
+
+
+class CallLifecycleRequest(RequestModel):
+    call_id: str = Field(..., min_length=1)
+    agent_id: Optional[int] = None
+    events: List[LifecycleEvent] = Field(..., min_length=1)
+
+
+class SaveCallDataRequest(RequestModel):
+    call_id: str = Field(..., min_length=1)
+    agent_id: Optional[int] = None
+    transcript_blob: Optional[str] = None
+    recording_blob: Optional[str] = None
+    transcript_url: Optional[str] = None
+    recording_url: Optional[str] = None
+    call_duration_seconds: Optional[float] = None
+    sip_joined_at: Optional[datetime] = None
+    sip_left_at: Optional[datetime] = None
@@ -0,0 +1,27 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse as _FastAPIORJSONResponse
+
+
+def _orjson_default(value):
+    """Fallback for types orjson does not encode natively (Decimal, time zones, ...)."""
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+class ORJSONResponse(_FastAPIORJSONResponse):
+    """
+    orjson response that never fails on an unexpected column type.
+    datetimes/dates/UUIDs are encoded natively (UTC as "Z"); anything else goes through
+    _orjson_default instead of raising.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            default=_orjson_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z,
+        )
@@ -1,27 +1,28 @@
-import json
 import logging
 import os
 import io
-import traceback
+import time
+import orjson
 from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Tuple, Any
-import requests
 import asyncio
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from fastapi import (
     APIRouter,
+    BackgroundTasks,
     Depends,
     HTTPException,
     Query,
     Request,
 )
 
-from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse, RedirectResponse
+from fastapi.responses import StreamingResponse, RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi import HTTPException, Response
 from rich import print
+from src.api.responses import ORJSONResponse
 from src.api.base_models import (
     UserLogin,
     UserRegister,
@@ -34,42 +35,125 @@ from src.api.base_models import (
     CreateAgentRequest,
     ResetPasswordRequest,
     ForgotPasswordRequest,
-    ContactFormRequest
+    ContactFormRequest,
+    AgentEvent,
+    CallStartedUpdate,
+    CallRecordingUpdate,
+    CallLifecycleRequest,
+    SaveCallDataRequest,
+    AvatarPresignRequest,
+    HHMM_RE,
 )
 from src.utils.db import PGDB 
 from src.utils.mail_management import Send_Mail
+from src.utils.cache import response_cache
 from src.utils.jwt_utils import create_access_token
 from src.utils.utils import (
     get_current_user, 
-    add_call_event, 
     fetch_and_store_transcript, 
     fetch_and_store_recording, 
     calculate_duration, 
-    check_if_answered, 
     hetzner_storage,
     generate_presigned_url,
     get_s3_client,
-    serialize_agent_data
+    serialize_agent_data,
+    build_transcript_text,
+    encode_cursor,
+    decode_cursor,
+    sniff_image_extension,
+    queue_avatar_delete,
+    AVATAR_CONTENT_TYPES,
+    AVATAR_MAX_BYTES,
 )
 from fastapi import File, UploadFile, Form
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 mail_obj = Send_Mail()
 db = PGDB()
-load_dotenv(override=True)
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 HETZNER_BUCKET_NAME = os.getenv("HETZNER_BUCKET_NAME")
+FRONTEND_URL = os.getenv("FRONTEND_URL", "https://www.mrbot-ki.de")
+BUSINESS_EMAIL = os.getenv("BUSINESS_EMAIL", "info@mrbot-ki.de")
+
+# Call status polling (/call-status) - built once, not per request
+CALL_STATUSES = frozenset({"initialized", "dialing", "connected", "completed", "unanswered"})
+FINAL_CALL_STATUSES = frozenset({"completed", "unanswered"})
+LEGACY_STATUS_MAP = {
+    "initiated": "initialized",
+    "in_progress": "connected",
+    "failed": "unanswered",
+    "not_attended": "unanswered"
+}
+CALL_STATUS_MESSAGES = {
+    "initialized": "Initializing...",
+    "dialing": "Dialing...",
+    "connected": "Call in progress",
+    "completed": "Call completed",
+    "unanswered": "Call not answered"
+}
+
+# LiveKit retries webhooks and can deliver the same event more than once;
+# seen event keys are remembered for 5 minutes so replays skip all DB work
+SEEN_WEBHOOK_EVENTS = TTLCache(maxsize=50_000, ttl=300)
+# Waits between "answered?" reads when a room ends (0.5s worst case, as the old fixed sleep)
+WEBHOOK_ANSWERED_BACKOFF = (0.05, 0.1, 0.15, 0.2)
+# Call detail ETags roll over every 30 minutes so a 304 never hands back
+# presigned URLs (valid 1 hour) that are about to expire
+CALL_DETAILS_ETAG_WINDOW = 1800
+
+# LiveKit events that are only recorded in events_log
+IGNORED_WEBHOOK_EVENTS = frozenset({
+    "room_started", "participant_joined", "egress_started",
+    "egress_updated", "track_published", "track_unpublished",
+})
+# LiveKit events that mean the call's room has closed
+TERMINAL_WEBHOOK_EVENTS = frozenset({"room_finished", "participant_left"})
 
 # ==================== HELPER ====================
+# Bodies for the authorization/lookup misses, encoded once. A fresh Response is
+# still built per request - middleware appends headers to the response it sends.
+STATIC_ERROR_BODIES = {
+    message: orjson.dumps({"error": message})
+    for message in (
+        "Agent not found or unauthorized",
+        "Agent not found",
+        "Call not found",
+    )
+}
+
 def error_response(message, status_code=400):
-    return JSONResponse(
+    body = STATIC_ERROR_BODIES.get(message)
+    if body is not None:
+        return Response(content=body, status_code=status_code, media_type="application/json")
+    return ORJSONResponse(
         status_code=status_code,
         content={"error": message}
     )
 
+# ==================== RESPONSE CACHE ====================
+# Dashboard reads are cached per admin under "agents:{user_id}:..." so any
+# agent mutation can drop all of that admin's entries with one pattern.
+AGENTS_LIST_TTL = 60
+AGENT_DETAIL_TTL = 30
+ANALYTICS_TTL = 60
+
+async def get_cached_response(key: str) -> Optional[Response]:
+    body = await response_cache.get(key)
+    if body is None:
+        return None
+    return Response(content=body, media_type="application/json")
+
+async def cache_response(key: str, response: ORJSONResponse, ttl_seconds: int) -> ORJSONResponse:
+    await response_cache.set(key, response.body, ttl_seconds)
+    return response
+
+async def invalidate_agent_cache(user_id: int):
+    await response_cache.delete_pattern(f"agents:{user_id}:*")
+
 def add_presigned_urls_to_agent(agent: dict) -> dict:
     """
     Add presigned URLs to agent data (avatar).
@@ -83,6 +167,40 @@ def add_presigned_urls_to_agent(agent: dict) -> dict:
         )
     return agent
 
+INVALID_AVATAR_TYPE_MESSAGE = f"Invalid file type. Allowed: {', '.join(AVATAR_CONTENT_TYPES)}"
+
+async def upload_avatar_file(avatar: UploadFile) -> str:
+    """
+    Validate an uploaded avatar and stream it to Hetzner; returns the object key.
+    The type is sniffed from the first bytes, not the filename. The spooled upload is
+    passed straight to boto3 in a worker thread, so it is never read fully into memory
+    and the PUT does not block the event loop.
+    Raises ValueError (client error) for oversize or non-image files.
+    """
+    size = avatar.size
+    if size is None:
+        avatar.file.seek(0, os.SEEK_END)
+        size = avatar.file.tell()
+    if size > AVATAR_MAX_BYTES:
+        raise ValueError("File too large. Maximum size: 5MB")
+    
+    head = await avatar.read(16)
+    await avatar.seek(0)
+    file_extension = sniff_image_extension(head)
+    if not file_extension:
+        raise ValueError(INVALID_AVATAR_TYPE_MESSAGE)
+    
+    return await asyncio.to_thread(hetzner_storage.upload_avatar_fileobj, avatar.file, file_extension)
+
+async def verify_uploaded_avatar(avatar_key: str) -> str:
+    """
+    Check an avatar the browser uploaded directly via /agents/avatar-presign; returns the key.
+    Raises ValueError (client error) if it is missing or not an acceptable image.
+    """
+    if not await asyncio.to_thread(hetzner_storage.verify_avatar_upload, avatar_key):
+        raise ValueError("Invalid avatar_key. Upload the avatar via /agents/avatar-presign first")
+    return avatar_key
+
 def add_presigned_urls_to_call(call: dict) -> dict:
     """
     Add presigned URLs to call data (recording, transcript).
@@ -113,11 +231,11 @@ def register_user(user: UserRegister):
     user_dict['is_admin'] = True
     try:
         db.register_user(user_dict)
-        return JSONResponse(status_code=201, content={"message": "You are registered successfully."})
+        return ORJSONResponse(status_code=201, content={"message": "You are registered successfully."})
     except ValueError as ve:
         return error_response(status_code=400, message=str(ve))
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Registration failed")
         return error_response(status_code=500, message=f"Registration failed: {str(e)}")
 
 @router.post("/login", response_model=LoginResponse)
@@ -127,7 +245,7 @@ def login_user(user: UserLogin):
             "email": user.email,
             "password": user.password
         }
-        logging.info(f"User dict: {user_dict}")
+        logger.info("User dict: %s", user_dict)
         user_dict["email"] = user_dict["email"].strip().lower()
         result = db.login_user(user_dict)
         if not result:
@@ -142,7 +260,7 @@ def login_user(user: UserLogin):
     except ValueError as ve:
         return error_response(str(ve), status_code=422)
     except Exception as e:
-        logging.error(f"Error during login: {str(e)}")
+        logger.exception("Error during login")
         return error_response(f"Internal server error: {str(e)}", status_code=500)
 
 # ==================== CALL STATUS ====================
@@ -150,20 +268,14 @@ def login_user(user: UserLogin):
 async def get_call_status(call_id: str):
     """Optimized status check with proper connection handling"""
     try:
-        conn = db.get_connection()
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute("""
-                    SELECT status, created_at, ended_at, duration, started_at
-                    FROM call_history 
-                    WHERE call_id = %s
-                """, (call_id,))
-                row = cursor.fetchone()
-        finally:
-            db.release_connection(conn)
+        row = await db.fetchrow("""
+            SELECT status, created_at, ended_at, duration, started_at
+            FROM call_history 
+            WHERE call_id = $1
+        """, call_id)
         
         if not row:
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=404,
                 content={"status": "not_found", "is_final": True}
             )
@@ -171,14 +283,8 @@ async def get_call_status(call_id: str):
         current_status, created_at, ended_at, duration, started_at = row
         
         # Normalize status
-        if current_status not in {"initialized", "dialing", "connected", "completed", "unanswered"}:
-            STATUS_MAP = {
-                "initiated": "initialized",
-                "in_progress": "connected",
-                "failed": "unanswered",
-                "not_attended": "unanswered"
-            }
-            current_status = STATUS_MAP.get(current_status, "initialized")
+        if current_status not in CALL_STATUSES:
+            current_status = LEGACY_STATUS_MAP.get(current_status, "initialized")
         
         # Calculate elapsed time
         time_elapsed = 0
@@ -187,17 +293,11 @@ async def get_call_status(call_id: str):
                 created_at = created_at.replace(tzinfo=timezone.utc)
             time_elapsed = (datetime.now(timezone.utc) - created_at).total_seconds()
         
-        is_final = current_status in {"completed", "unanswered"}
+        is_final = current_status in FINAL_CALL_STATUSES
         
         response = {
             "status": current_status,
-            "message": {
-                "initialized": "Initializing...",
-                "dialing": "Dialing...",
-                "connected": "Call in progress",
-                "completed": "Call completed",
-                "unanswered": "Call not answered"
-            }.get(current_status, current_status),
+            "message": CALL_STATUS_MESSAGES.get(current_status, current_status),
             "time_elapsed": round(time_elapsed, 1),
             "is_final": is_final
         }
@@ -206,14 +306,14 @@ async def get_call_status(call_id: str):
             response["duration"] = round(duration, 1)
         
         if started_at:
-            response["started_at"] = started_at.isoformat()
+            response["started_at"] = started_at
         if ended_at:
-            response["ended_at"] = ended_at.isoformat()
+            response["ended_at"] = ended_at
         
-        return JSONResponse(response)
+        return ORJSONResponse(response)
     except Exception as e:
-        logging.error(f"get_call_status error: {e}")
-        return JSONResponse(
+        logger.exception("get_call_status error")
+        return ORJSONResponse(
             {"status": "error", "message": str(e), "is_final": True},
             status_code=500
         )
@@ -223,50 +323,35 @@ async def get_call_status(call_id: str):
 async def get_user_call_history(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, le=100),
+    cursor: Optional[str] = Query(None),
     user=Depends(get_current_user)
 ):
-    """Get call history for all agents belonging to the logged-in admin"""
+    """
+    Get call history for all agents belonging to the logged-in admin.
+    Pass pagination.next_cursor back as `cursor` to fetch the next page without OFFSET.
+    """
     try:
-        history = db.get_call_history_by_admin(user["id"], page, page_size)
+        try:
+            before = decode_cursor(cursor) if cursor else None
+        except ValueError as ve:
+            return error_response(str(ve), 400)
+
+        history = db.get_call_history_by_admin(user["id"], page, page_size, before)
 
         calls = []
         for call in history.get("calls", []):
             call_data = {**call}
             
-            # Format timestamps
-            for field in ["created_at", "started_at", "ended_at"]:
-                if call.get(field):
-                    call_data[field] = call[field].isoformat() if hasattr(call[field], 'isoformat') else str(call[field])
-            
-            # Calculate display duration if not available
-            if not call_data.get("duration") and call.get("started_at") and call.get("ended_at"):
-                try:
-                    start = call["started_at"] if isinstance(call["started_at"], datetime) else datetime.fromisoformat(str(call["started_at"]))
-                    end = call["ended_at"] if isinstance(call["ended_at"], datetime) else datetime.fromisoformat(str(call["ended_at"]))
-                    call_data["duration"] = round((end - start).total_seconds(), 1)
-                except:
-                    call_data["duration"] = 0
-            
-            # Parse transcript from JSONB
-            transcript_text = None
-            if call.get("transcript"):
+            # duration and has_recording are computed in the SQL
+            # transcript_text is written at ingest; rows stored before that only have the JSONB
+            transcript_text = call.get("transcript_text")
+            if transcript_text is None and call.get("transcript"):
                 try:
-                    tr = call["transcript"]
-                    if isinstance(tr, str):
-                        tr = json.loads(tr)
-                    if isinstance(tr, list):
-                        lines = []
-                        for msg in tr:
-                            if msg.get("type") == "message":
-                                speaker = "Assistant" if msg.get("role") == "assistant" else "User"
-                                text = " ".join(msg.get("content", [])) if isinstance(msg.get("content"), list) else str(msg.get("content"))
-                                lines.append(f"{speaker}: {text}")
-                        transcript_text = "\n".join(lines)
+                    transcript_text = build_transcript_text(call["transcript"])
                 except Exception as e:
-                    logging.warning(f"Transcript parse error for {call.get('id')}: {e}")
+                    logger.warning("Transcript parse error for %s: %s", call.get('id'), e)
             
             call_data["transcript_text"] = transcript_text
-            call_data["has_recording"] = bool(call.get("recording_blob"))
             
             # 🔥 ADD PRESIGNED URLS
             call_data = add_presigned_urls_to_call(call_data)
@@ -279,113 +364,138 @@ async def get_user_call_history(
             "total": history.get("total", len(calls)),
             "completed_calls": history.get("completed_calls", 0),
             "not_completed_calls": history.get("not_completed_calls", 0),
+            "next_cursor": encode_cursor(history.get("next_cursor")),
         }
 
-        return JSONResponse(content=jsonable_encoder({
+        return ORJSONResponse({
             "user_id": user["id"],
             "pagination": pagination,
             "calls": calls
-        }))
+        })
 
     except Exception as e:
-        logging.error(f"Error fetching history: {e}")
-        traceback.print_exc()
+        logger.exception("Error fetching history")
         raise HTTPException(status_code=500, detail=str(e))
 
 # ==================== AGENT EVENT REPORTING ====================
 @router.post("/agent/report-event")
-async def receive_agent_event(request: Request):
+async def receive_agent_event(event: AgentEvent):
     """Receive status updates from inbound agent"""
     try:
-        data = await request.json()
-        
-        call_id = data.get("call_id")
-        status = data.get("status")
-        agent_id = data.get("agent_id")
-        timestamp = data.get("timestamp")
-        
-        if not call_id or not status:
-            return JSONResponse({"error": "Missing data"}, status_code=400)
-        
-        if status not in {"initialized", "dialing", "connected", "unanswered", "completed"}:
-            return JSONResponse({"error": "Invalid status"}, status_code=400)
+        call_id = event.call_id
+        status = event.status
         
         updates = {"status": status}
         now = datetime.now(timezone.utc)
         
+        # Only the first "connected" event sets started_at (COALESCE in the same UPDATE)
         if status == "connected":
-            conn = db.get_connection()
-            try:
-                with conn.cursor() as cursor:
-                    cursor.execute(
-                        "SELECT started_at FROM call_history WHERE call_id = %s",
-                        (call_id,)
-                    )
-                    row = cursor.fetchone()
-                    if row and not row[0]:
-                        updates["started_at"] = now
-            finally:
-                db.release_connection(conn)
+            updates["started_at"] = now
         
         if status == "unanswered":
             updates["ended_at"] = now
             updates["duration"] = 0
         
-        db.update_call_history(call_id, updates)
+        await db.update_call_history_async(call_id, updates, keep_existing=("started_at",))
         
-        return JSONResponse({"success": True})
+        return ORJSONResponse({"success": True})
     except Exception as e:
-        logging.error(f"report-event error: {e}")
-        return JSONResponse({"error": str(e)}, status_code=500)
+        logger.exception("report-event error")
+        return ORJSONResponse({"error": str(e)}, status_code=500)
 
 @router.post("/agent/update-call-started")
-async def update_call_started(request: Request):
+async def update_call_started(payload: CallStartedUpdate):
     """Update call with started_at timestamp and caller info"""
     try:
-        data = await request.json()
-        call_id = data.get("call_id")
-        caller_number = data.get("caller_number")
-        started_at = data.get("started_at")
-        
         updates = {}
-        if caller_number:
-            updates["caller_number"] = caller_number
-        if started_at:
-            updates["started_at"] = datetime.fromisoformat(started_at)
+        if payload.caller_number:
+            updates["caller_number"] = payload.caller_number
+        if payload.started_at:
+            updates["started_at"] = payload.started_at
         
         if updates:
-            db.update_call_history(call_id, updates)
+            await db.update_call_history_async(payload.call_id, updates)
         
-        return JSONResponse({"success": True})
+        return ORJSONResponse({"success": True})
     except Exception as e:
-        logging.error(f"update-call-started error: {e}")
-        return JSONResponse({"error": str(e)}, status_code=500)
+        logger.exception("update-call-started error")
+        return ORJSONResponse({"error": str(e)}, status_code=500)
 
 @router.post("/agent/update-call-recording")
-async def update_call_recording(request: Request):
+async def update_call_recording(payload: CallRecordingUpdate):
     """Update call with recording blob path"""
     try:
-        data = await request.json()
-        call_id = data.get("call_id")
-        recording_blob = data.get("recording_blob")
-        recording_url = data.get("recording_url")
-        
         updates = {}
-        if recording_blob:
-            updates["recording_blob"] = recording_blob
-        if recording_url:
-            updates["recording_url"] = recording_url
+        if payload.recording_blob:
+            updates["recording_blob"] = payload.recording_blob
+        if payload.recording_url:
+            updates["recording_url"] = payload.recording_url
         
         if updates:
-            db.update_call_history(call_id, updates)
+            await db.update_call_history_async(payload.call_id, updates)
         
-        return JSONResponse({"success": True})
+        return ORJSONResponse({"success": True})
+    except Exception as e:
+        logger.exception("update-call-recording error")
+        return ORJSONResponse({"error": str(e)}, status_code=500)
+
+@router.post("/agent/call-lifecycle")
+async def update_call_lifecycle(payload: CallLifecycleRequest):
+    """
+    Apply several lifecycle updates from the agent in one request.
+
+    Body: {"call_id": ..., "agent_id": ..., "events": [...]} where each event is one of
+    - {"type": "recording_started", "recording_blob": ..., "recording_url": ...}
+    - {"type": "started_at", "started_at": ..., "caller_number": ...}
+    - {"type": "status", "status": ...}
+
+    All events are merged and written with a single UPDATE (one transaction).
+    """
+    try:
+        call_id = payload.call_id
+        updates = {}
+        status = None
+        now = datetime.now(timezone.utc)
+
+        for event in payload.events:
+            if event.type == "recording_started":
+                if event.recording_blob:
+                    updates["recording_blob"] = event.recording_blob
+                if event.recording_url:
+                    updates["recording_url"] = event.recording_url
+
+            elif event.type == "started_at":
+                if event.caller_number:
+                    updates["caller_number"] = event.caller_number
+                if event.started_at:
+                    updates["started_at"] = event.started_at
+
+            elif event.type == "status":
+                if event.status is None:
+                    return ORJSONResponse({"error": "Missing status"}, status_code=400)
+                status = event.status
+                updates["status"] = status
+
+        # An explicit started_at from the agent wins; a bare "connected" only fills it in if unset
+        keep_existing = ()
+        if status == "connected" and "started_at" not in updates:
+            updates["started_at"] = now
+            keep_existing = ("started_at",)
+
+        if status == "unanswered":
+            updates["ended_at"] = now
+            updates["duration"] = 0
+
+        if updates:
+            await db.update_call_history_async(call_id, updates, keep_existing=keep_existing)
+
+        return ORJSONResponse({"success": True})
     except Exception as e:
-        logging.error(f"update-call-recording error: {e}")
-        return JSONResponse({"error": str(e)}, status_code=500)
+        logger.exception("call-lifecycle error")
+        return ORJSONResponse({"error": str(e)}, status_code=500)
 
 @router.post("/agent/save-call-data")
-async def save_call_data(request: Request):
+async def save_call_data(payload: SaveCallDataRequest, background_tasks: BackgroundTasks):
     """
     Save transcript, recording metadata, and ACCURATE call duration after call ends.
     
@@ -398,23 +508,16 @@ async def save_call_data(request: Request):
     Backend will:
     1. Store paths + duration in DB
     2. Update agent's used_minutes (accumulative)
-    3. Download transcript after 5s delay → Store JSONB in DB
+    3. Download transcript once the blob exists (background task) → Store JSONB in DB
     """
     try:
-        data = await request.json()
-        
-        call_id = data.get("call_id")
-        agent_id = data.get("agent_id")
-        transcript_blob = data.get("transcript_blob")
-        recording_blob = data.get("recording_blob")
-        transcript_url = data.get("transcript_url")
-        recording_url = data.get("recording_url")
-        call_duration_seconds = data.get("call_duration_seconds")
-        sip_joined_at = data.get("sip_joined_at")
-        sip_left_at = data.get("sip_left_at")
-        
-        if not call_id:
-            return error_response("Missing call_id", 400)
+        call_id = payload.call_id
+        agent_id = payload.agent_id
+        transcript_blob = payload.transcript_blob
+        recording_blob = payload.recording_blob
+        transcript_url = payload.transcript_url
+        recording_url = payload.recording_url
+        call_duration_seconds = payload.call_duration_seconds
         
         # Update call history with ACCURATE duration
         updates = {}
@@ -431,83 +534,71 @@ async def save_call_data(request: Request):
         # Store accurate duration from agent
         if call_duration_seconds is not None:
             updates["duration"] = float(call_duration_seconds)
-            logging.info(
-                f"⏱️ Call {call_id}: Duration = {call_duration_seconds:.2f}s "
-                f"({call_duration_seconds / 60:.2f} min)"
+            logger.info(
+                "⏱️ Call %s: Duration = %.2fs (%.2f min)",
+                call_id, call_duration_seconds, call_duration_seconds / 60
             )
         
         # Store SIP participant timestamps
-        if sip_joined_at:
-            try:
-                updates["started_at"] = datetime.fromisoformat(sip_joined_at)
-            except:
-                pass
+        if payload.sip_joined_at:
+            updates["started_at"] = payload.sip_joined_at
         
-        if sip_left_at:
-            try:
-                updates["ended_at"] = datetime.fromisoformat(sip_left_at)
-            except:
-                pass
+        if payload.sip_left_at:
+            updates["ended_at"] = payload.sip_left_at
         
         # Mark call as completed
         updates["status"] = "completed"
         
         if updates:
-            db.update_call_history(call_id, updates)
-            logging.info(f"✅ Call history updated for {call_id}")
+            await db.update_call_history_async(call_id, updates)
+            logger.info("✅ Call history updated for %s", call_id)
         
         # Update agent's used_minutes (ACCUMULATIVE)
         if agent_id and call_duration_seconds and call_duration_seconds > 0:
             duration_minutes = call_duration_seconds / 60
             
             try:
-                # Get current usage
-                minutes_check = db.check_agent_minutes_available(agent_id)
+                # Get current usage (sync psycopg2 calls run in the threadpool, off the loop)
+                minutes_check = await asyncio.to_thread(db.check_agent_minutes_available, agent_id)
                 old_used = minutes_check["used_minutes"]
                 
                 # Update (will add to existing)
-                db.update_agent_used_minutes(agent_id, duration_minutes)
+                await asyncio.to_thread(db.update_agent_used_minutes, agent_id, duration_minutes)
                 
                 # Verify update
-                new_check = db.check_agent_minutes_available(agent_id)
+                new_check = await asyncio.to_thread(db.check_agent_minutes_available, agent_id)
                 new_used = new_check["used_minutes"]
                 
-                logging.info(
-                    f"✅ Agent {agent_id} minutes updated: "
-                    f"{old_used:.2f} → {new_used:.2f} min "
-                    f"(+{duration_minutes:.2f} min from call {call_id})"
+                logger.info(
+                    "✅ Agent %s minutes updated: %.2f → %.2f min (+%.2f min from call %s)",
+                    agent_id, old_used, new_used, duration_minutes, call_id
                 )
                 
                 # Warn if approaching limit
                 if new_check["remaining_minutes"] < 60:  # Less than 1 hour
-                    logging.warning(
-                        f"⚠️ Agent {agent_id} low on minutes: "
-                        f"{new_check['remaining_minutes']:.1f} min remaining"
+                    logger.warning(
+                        "⚠️ Agent %s low on minutes: %.1f min remaining",
+                        agent_id, new_check['remaining_minutes']
                     )
                 
             except Exception as e:
-                logging.error(f"❌ Failed to update agent minutes: {e}")
-                traceback.print_exc()
+                logger.exception("❌ Failed to update agent minutes")
                 # Don't fail the entire request if minutes update fails
         
-        # DELAYED transcript download & DB storage (5s)
+        # Transcript download & DB storage runs after the response is sent;
+        # it polls the bucket until the blob exists instead of sleeping a fixed delay
         if transcript_blob:
-            async def delayed_transcript():
-                await asyncio.sleep(5)
-                logging.info(f"📥 Downloading transcript for {call_id}")
-                await fetch_and_store_transcript(call_id, None, transcript_blob)
-            asyncio.create_task(delayed_transcript())
+            background_tasks.add_task(fetch_and_store_transcript, call_id, None, transcript_blob)
         
-        return JSONResponse({
+        return ORJSONResponse({
             "success": True,
             "message": "Call data saved successfully",
             "duration_minutes": round(call_duration_seconds / 60, 2) if call_duration_seconds else None
         })
         
     except Exception as e:
-        logging.error(f"save_call_data error: {e}")
-        traceback.print_exc()
-        return JSONResponse({"error": str(e)}, status_code=500)
+        logger.exception("save_call_data error")
+        return ORJSONResponse({"error": str(e)}, status_code=500)
 
 # ==================== AGENT MANAGEMENT ====================
 @router.get("/agents/{agent_id}/calls")
@@ -515,61 +606,46 @@ async def get_agent_call_history(
     agent_id: int,
     page: int = Query(1, ge=1),
     page_size: int = Query(10, le=100),
+    cursor: Optional[str] = Query(None),
     user=Depends(get_current_user)
 ):
-    """Get call history for a specific agent"""
+    """
+    Get call history for a specific agent.
+    Pass pagination.next_cursor back as `cursor` to fetch the next page without OFFSET.
+    """
     try:
-        agent = db.get_agent_by_id(agent_id)
+        agent = db.get_agent_by_id_cached(agent_id)
         if not agent or agent["admin_id"] != user["id"]:
             raise HTTPException(status_code=403, detail="Access denied")
         
-        history = db.get_call_history_by_agent(agent_id, page, page_size)
+        try:
+            before = decode_cursor(cursor) if cursor else None
+        except ValueError as ve:
+            return error_response(str(ve), 400)
+
+        history = db.get_call_history_by_agent(agent_id, page, page_size, before)
         
         calls = []
         for call in history.get("calls", []):
             call_data = {**call}
             
-            # Format timestamps
-            for field in ["created_at", "started_at", "ended_at"]:
-                if call.get(field):
-                    call_data[field] = call[field].isoformat()
-            
-            # Calculate duration if missing
-            if not call_data.get("duration") and call.get("started_at") and call.get("ended_at"):
-                try:
-                    start = call["started_at"] if isinstance(call["started_at"], datetime) else datetime.fromisoformat(str(call["started_at"]))
-                    end = call["ended_at"] if isinstance(call["ended_at"], datetime) else datetime.fromisoformat(str(call["ended_at"]))
-                    call_data["duration"] = round((end - start).total_seconds(), 1)
-                except:
-                    call_data["duration"] = 0
-            
-            # Parse transcript
-            transcript_text = None
-            if call.get("transcript"):
+            # duration and has_recording are computed in the SQL
+            # transcript_text is written at ingest; rows stored before that only have the JSONB
+            transcript_text = call.get("transcript_text")
+            if transcript_text is None and call.get("transcript"):
                 try:
-                    tr = call["transcript"]
-                    if isinstance(tr, str):
-                        tr = json.loads(tr)
-                    if isinstance(tr, list):
-                        lines = []
-                        for msg in tr:
-                            if msg.get("type") == "message":
-                                speaker = "Assistant" if msg.get("role") == "assistant" else "User"
-                                text = " ".join(msg.get("content", [])) if isinstance(msg.get("content"), list) else str(msg.get("content"))
-                                lines.append(f"{speaker}: {text}")
-                        transcript_text = "\n".join(lines)
+                    transcript_text = build_transcript_text(call["transcript"])
                 except Exception as e:
-                    logging.warning(f"Transcript parse error: {e}")
+                    logger.warning("Transcript parse error: %s", e)
             
             call_data["transcript_text"] = transcript_text
-            call_data["has_recording"] = bool(call.get("recording_blob"))
             
             # 🔥 ADD PRESIGNED URLS
             call_data = add_presigned_urls_to_call(call_data)
             
             calls.append(call_data)
         
-        return JSONResponse(content=jsonable_encoder({
+        return ORJSONResponse({
             "success": True,
             "agent_id": agent_id,
             "agent_name": agent["agent_name"],
@@ -579,15 +655,15 @@ async def get_agent_call_history(
                 "page_size": history["page_size"],
                 "total": history["total"],
                 "completed_calls": history["completed_calls"],
-                "not_completed_calls": history["not_completed_calls"]
+                "not_completed_calls": history["not_completed_calls"],
+                "next_cursor": encode_cursor(history["next_cursor"])
             },
             "calls": calls
-        }))
+        })
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Error fetching agent calls: {e}")
-        traceback.print_exc()
+        logger.exception("Error fetching agent calls")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/agent/config/{phone_number}")
@@ -608,9 +684,9 @@ async def get_agent_config(phone_number: str):
         
         # ❌ Block if no minutes remaining
         if not minutes_check["available"]:
-            logging.warning(
-                f"⛔ Agent {agent_id} ({phone_number}): "
-                f"No minutes remaining ({minutes_check['used_minutes']}/{minutes_check['allowed_minutes']})"
+            logger.warning(
+                "⛔ Agent %s (%s): No minutes remaining (%s/%s)",
+                agent_id, phone_number, minutes_check['used_minutes'], minutes_check['allowed_minutes']
             )
             raise HTTPException(
                 status_code=403,
@@ -618,13 +694,13 @@ async def get_agent_config(phone_number: str):
             )
         
         # ✅ Minutes available - send config WITHOUT minutes info
-        logging.info(
-            f"✅ Agent {agent_id} config sent - "
-            f"{minutes_check['remaining_minutes']:.1f} minutes remaining"
+        logger.info(
+            "✅ Agent %s config sent - %.1f minutes remaining",
+            agent_id, minutes_check['remaining_minutes']
         )
         agent = serialize_agent_data(dict(agent))
 
-        return JSONResponse({
+        return ORJSONResponse({
             "success": True,
             "agent": agent
         })
@@ -632,8 +708,7 @@ async def get_agent_config(phone_number: str):
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Error fetching agent config: {e}")
-        traceback.print_exc()
+        logger.exception("Error fetching agent config")
         raise HTTPException(status_code=500, detail=str(e))
     
 @router.get("/agent/new-call")
@@ -659,9 +734,9 @@ async def new_call(
             if '@' in cleaned_caller:
                 cleaned_caller = cleaned_caller.split('@')[0].replace('sip:', '')
             
-            logging.info(f"📞 Call from {cleaned_caller} to agent {agent['agent_id']}")
+            logger.info("📞 Call from %s to agent %s", cleaned_caller, agent['agent_id'])
         else:
-            logging.info(f"📞 Call from unknown number to agent {agent['agent_id']}")
+            logger.info("📞 Call from unknown number to agent %s", agent['agent_id'])
         
         # INSERT call history with caller_number
         db.insert_call_history(
@@ -671,15 +746,14 @@ async def new_call(
             caller_number=cleaned_caller
         )
         
-        return JSONResponse({
+        return ORJSONResponse({
             "success": True,
             "message": "Call history initialized",
             "agent_id": agent["agent_id"],
             "caller_number": cleaned_caller
         })
     except Exception as e:
-        logging.error(f"Error initializing call: {e}")
-        traceback.print_exc()
+        logger.exception("Error initializing call")
         raise HTTPException(status_code=500, detail=str(e))
 
     
@@ -691,6 +765,11 @@ async def get_dashboard_analytics(current_user: dict = Depends(get_current_user)
     """
     try:
         user_id = current_user["id"]
+        cache_key = f"agents:{user_id}:analytics"
+        cached = await get_cached_response(cache_key)
+        if cached:
+            return cached
+
         analytics = db.get_admin_dashboard_analytics(user_id)
         
         # 🔥 ADD MINUTES INFO TO TOP AGENTS
@@ -711,15 +790,15 @@ async def get_dashboard_analytics(current_user: dict = Depends(get_current_user)
                 "can_accept_calls": minutes_check["available"]
             }
         
-        return JSONResponse(
+        return await cache_response(cache_key, ORJSONResponse(
             status_code=200,
             content={
                 "success": True,
                 "data": analytics
             }
-        )
+        ), ANALYTICS_TTL)
     except Exception as e:
-        logging.error(f"Error fetching dashboard analytics: {e}")
+        logger.exception("Error fetching dashboard analytics")
         return error_response("Failed to fetch analytics", 500)
     
 
@@ -735,6 +814,11 @@ async def get_all_agents(
     """
     try:
         user_id = current_user["id"]
+        cache_key = f"agents:{user_id}:list:{page}:{page_size}"
+        cached = await get_cached_response(cache_key)
+        if cached:
+            return cached
+
         result = db.get_agents_with_call_stats(user_id, page, page_size)
         
         # 🔥 NEW: Add minutes info to each agent
@@ -758,15 +842,15 @@ async def get_all_agents(
                 "can_accept_calls": minutes_check["available"]
             }
         
-        return JSONResponse(
+        return await cache_response(cache_key, ORJSONResponse(
             status_code=200,
             content={
                 "success": True,
                 "data": result
             }
-        )
+        ), AGENTS_LIST_TTL)
     except Exception as e:
-        logging.error(f"Error fetching agents: {e}")
+        logger.exception("Error fetching agents")
         return error_response("Failed to fetch agents", 500)
 
 @router.get("/agents/{agent_id}")
@@ -782,6 +866,11 @@ async def get_agent_detail(
     """
     try:
         user_id = current_user["id"]
+        cache_key = f"agents:{user_id}:detail:{agent_id}:{calls_page}:{calls_page_size}"
+        cached = await get_cached_response(cache_key)
+        if cached:
+            return cached
+
         agent_detail = db.get_agent_detail_with_calls(
             agent_id, user_id, calls_page, calls_page_size
         )
@@ -804,25 +893,52 @@ async def get_agent_detail(
         }
         
         # Add presigned URL to agent
+        # Only the agent's own fields need converting (time -> "HH:MM"); the call page
+        # holds plain rows that orjson encodes directly, so it skips the recursive walk
+        calls = agent_detail.pop("calls", None) or {}
         add_presigned_urls_to_agent(agent_detail)
         agent_detail = serialize_agent_data(agent_detail)
         
         # Add presigned URLs to calls
-        for call in agent_detail.get("calls", {}).get("data", []):
+        for call in calls.get("data", []):
             add_presigned_urls_to_call(call)
+        agent_detail["calls"] = calls
         
-        return JSONResponse(
+        return await cache_response(cache_key, ORJSONResponse(
             status_code=200,
             content={
                 "success": True,
                 "data": agent_detail
             }
-        )
+        ), AGENT_DETAIL_TTL)
     except Exception as e:
-        logging.error(f"Error fetching agent detail: {e}")
+        logger.exception("Error fetching agent detail")
         return error_response("Failed to fetch agent details", 500)
     
 
+@router.post("/agents/avatar-presign")
+async def presign_avatar_upload(
+    request: AvatarPresignRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Presigned POST for uploading an avatar straight to Hetzner from the browser.
+    Send the returned fields + file as multipart to `url`, then pass `avatar_key`
+    to POST /agents or PUT /agents/{agent_id}.
+    """
+    try:
+        presigned = hetzner_storage.presign_avatar_upload(request.file_extension)
+        return ORJSONResponse(
+            status_code=200,
+            content={
+                "success": True,
+                "data": presigned
+            }
+        )
+    except Exception as e:
+        logger.exception("Error presigning avatar upload")
+        return error_response("Failed to prepare avatar upload", 500)
+
 @router.post("/agents")
 async def create_agent(
     agent_name: str = Form(...),
@@ -837,6 +953,7 @@ async def create_agent(
     business_hours_end: str = Form(None),    # NEW (format: "17:00")
     allowed_minutes: int = Form(0),          # NEW
     avatar: UploadFile = File(None),
+    avatar_key: str = Form(None),            # key from /agents/avatar-presign
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -846,11 +963,6 @@ async def create_agent(
     try:
         user_id = current_user["id"]
         
-        # Check if phone number already exists
-        existing = db.get_agent_by_phone(phone_number)
-        if existing:
-            return error_response("Phone number already in use", 400)
-        
         # Validate business hours format if provided
         if business_hours_start or business_hours_end:
             if not (business_hours_start and business_hours_end):
@@ -860,39 +972,30 @@ async def create_agent(
                 )
             
             # Simple HH:MM validation
-            import re
-            time_pattern = r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$'
-            if not re.match(time_pattern, business_hours_start):
+            if not HHMM_RE.match(business_hours_start):
                 return error_response("Invalid business_hours_start format. Use HH:MM", 400)
-            if not re.match(time_pattern, business_hours_end):
+            if not HHMM_RE.match(business_hours_end):
                 return error_response("Invalid business_hours_end format. Use HH:MM", 400)
         
         # Validate allowed_minutes
         if allowed_minutes < 0:
             return error_response("allowed_minutes cannot be negative", 400)
         
-        # Upload avatar if provided
-        avatar_key = None
+        # Upload avatar if provided (or verify one the browser uploaded directly)
         if avatar and avatar.filename:
-            allowed_extensions = {'jpg', 'jpeg', 'png', 'gif', 'webp'}
-            file_extension = avatar.filename.split('.')[-1].lower()
-            
-            if file_extension not in allowed_extensions:
-                return error_response(
-                    f"Invalid file type. Allowed: {', '.join(allowed_extensions)}", 
-                    400
-                )
-            
-            content = await avatar.read()
-            if len(content) > 5 * 1024 * 1024:
-                return error_response("File too large. Maximum size: 5MB", 400)
-            
             try:
-                avatar_key = hetzner_storage.upload_avatar(content, file_extension)
-                logging.info(f"✅ Avatar uploaded with key: {avatar_key}")
+                avatar_key = await upload_avatar_file(avatar)
+                logger.info("✅ Avatar uploaded with key: %s", avatar_key)
+            except ValueError as e:
+                return error_response(str(e), 400)
             except Exception as e:
-                logging.error(f"❌ Avatar upload failed: {e}")
+                logger.exception("❌ Avatar upload failed")
                 return error_response("Failed to upload avatar", 500)
+        elif avatar_key:
+            try:
+                await verify_uploaded_avatar(avatar_key)
+            except ValueError as e:
+                return error_response(str(e), 400)
         
         # Create agent data
         agent_data = {
@@ -911,8 +1014,13 @@ async def create_agent(
             "admin_id": user_id
         }
         
-        # Save to database
+        # Save to database (the phone number uniqueness check happens in the same INSERT)
         agent = db.create_agent_with_voice_type(agent_data)
+        if not agent:
+            if avatar_key:
+                await asyncio.to_thread(hetzner_storage.delete_avatar, avatar_key)
+            return error_response("Phone number already in use", 400)
+        await invalidate_agent_cache(user_id)
         
         # 🔥 FIX: Serialize time objects before JSON response
         agent = serialize_agent_data(agent)
@@ -920,7 +1028,7 @@ async def create_agent(
         # Add presigned URL for response
         add_presigned_urls_to_agent(agent)
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=201,
             content={
                 "success": True,
@@ -934,13 +1042,13 @@ async def create_agent(
     except ValueError as e:
         return error_response(str(e), 400)
     except Exception as e:
-        logging.error(f"Error creating agent: {e}")
-        traceback.print_exc()
+        logger.exception("Error creating agent")
         return error_response("Failed to create agent", 500)
 
 @router.put("/agents/{agent_id}")
 async def update_agent(
     agent_id: int,
+    background_tasks: BackgroundTasks,
     agent_name: str = Form(None),
     phone_number: str = Form(None),
     system_prompt: str = Form(None),
@@ -953,6 +1061,7 @@ async def update_agent(
     business_hours_end: str = Form(None),    # NEW
     allowed_minutes: int = Form(None),       # NEW
     avatar: UploadFile = File(None),
+    avatar_key: str = Form(None),            # key from /agents/avatar-presign
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -960,14 +1069,11 @@ async def update_agent(
     ✅ Now includes owner_email, business_hours, and allowed_minutes.
     Note: used_minutes cannot be updated here - use reset endpoint instead.
     """
+    # Set once a new avatar is stored; deleted again if the agent update does not go through
+    new_avatar_key = None
     try:
         user_id = current_user["id"]
         
-        # Get existing agent
-        existing_agent = db.get_agent_by_id(agent_id)
-        if not existing_agent or existing_agent["admin_id"] != user_id:
-            return error_response("Agent not found or unauthorized", 404)
-        
         # Build updates dict
         updates = {}
         if agent_name is not None:
@@ -997,55 +1103,56 @@ async def update_agent(
         
         
         if "business_hours_start" in updates:
-            import re
-            time_pattern = r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$'
-            if not re.match(time_pattern, updates["business_hours_start"]):
+            if not HHMM_RE.match(updates["business_hours_start"]):
                 return error_response("Invalid business_hours_start format. Use HH:MM", 400)
 
         if "business_hours_end" in updates:
-            import re
-            time_pattern = r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$'
-            if not re.match(time_pattern, updates["business_hours_end"]):
+            if not HHMM_RE.match(updates["business_hours_end"]):
                 return error_response("Invalid business_hours_end format. Use HH:MM", 400)
         
-        # Handle avatar upload
-        if avatar and avatar.filename:
-            allowed_extensions = {'jpg', 'jpeg', 'png', 'gif', 'webp'}
-            file_extension = avatar.filename.split('.')[-1].lower()
-            
-            if file_extension not in allowed_extensions:
-                return error_response(
-                    f"Invalid file type. Allowed: {', '.join(allowed_extensions)}", 
-                    400
-                )
-            
-            content = await avatar.read()
-            if len(content) > 5 * 1024 * 1024:
-                return error_response("File too large. Maximum size: 5MB", 400)
-            
+        # Nothing to change - answer before touching the DB
+        has_avatar = bool(avatar and avatar.filename) or bool(avatar_key)
+        if not updates and not has_avatar:
+            return error_response("No fields to update", 400)
+        
+        # Sync psycopg2 calls run in the threadpool so this async handler never blocks the loop
+        # Get existing agent
+        existing_agent = await asyncio.to_thread(db.get_agent_by_id_cached, agent_id)
+        if not existing_agent or existing_agent["admin_id"] != user_id:
+            return error_response("Agent not found or unauthorized", 404)
+        
+        # Handle avatar upload (or one the browser uploaded directly)
+        if has_avatar:
             try:
-                new_avatar_key = hetzner_storage.upload_avatar(content, file_extension)
-                
-                # Delete old avatar if exists
-                old_avatar_key = existing_agent.get("avatar_url")
-                if old_avatar_key:
-                    hetzner_storage.delete_avatar(old_avatar_key)
+                if avatar and avatar.filename:
+                    new_avatar_key = await upload_avatar_file(avatar)
+                else:
+                    new_avatar_key = await verify_uploaded_avatar(avatar_key)
                 
                 updates["avatar_url"] = new_avatar_key
-                logging.info(f"✅ Avatar updated: {new_avatar_key}")
+                logger.info("✅ Avatar updated: %s", new_avatar_key)
                 
+            except ValueError as e:
+                return error_response(str(e), 400)
             except Exception as e:
-                logging.error(f"❌ Avatar upload failed: {e}")
+                logger.exception("❌ Avatar upload failed")
                 return error_response("Failed to upload avatar", 500)
         
-        if not updates:
-            return error_response("No fields to update", 400)
-        
         # Update agent
-        result = db.update_agent_with_voice_type(agent_id, user_id, updates)
+        result = await asyncio.to_thread(db.update_agent_with_voice_type, agent_id, user_id, updates)
         
         if not result:
+            if new_avatar_key:
+                background_tasks.add_task(hetzner_storage.delete_avatar, new_avatar_key)
             return error_response("Update failed", 500)
+        new_avatar_key = None  # now referenced by the agent
+
+        await invalidate_agent_cache(user_id)
+        
+        # Delete the replaced avatar after the response is sent (delete_avatar only logs on failure)
+        old_avatar_key = existing_agent.get("avatar_url")
+        if "avatar_url" in updates and old_avatar_key and old_avatar_key != updates["avatar_url"]:
+            background_tasks.add_task(hetzner_storage.delete_avatar, old_avatar_key)
         
         # 🔥 FIX: Serialize time objects before JSON response
         result = serialize_agent_data(result)
@@ -1053,7 +1160,7 @@ async def update_agent(
         # Add presigned URL
         add_presigned_urls_to_agent(result)
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
             content={
                 "success": True,
@@ -1063,12 +1170,81 @@ async def update_agent(
         )
         
     except ValueError as e:
+        if new_avatar_key:
+            background_tasks.add_task(hetzner_storage.delete_avatar, new_avatar_key)
         return error_response(str(e), 400)
     except Exception as e:
-        logging.error(f"Error updating agent: {e}")
-        traceback.print_exc()
+        logger.exception("Error updating agent")
+        if new_avatar_key:
+            background_tasks.add_task(hetzner_storage.delete_avatar, new_avatar_key)
         return error_response("Failed to update agent", 500)
 
+@router.put("/agents/{agent_id}/avatar")
+async def replace_agent_avatar(
+    agent_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Replace an agent's avatar with the raw image bytes as the request body
+    (Content-Type: application/octet-stream or the image type).
+    Skips multipart parsing: the body is read straight from the stream and
+    rejected as soon as it passes the 5MB limit.
+    """
+    try:
+        user_id = current_user["id"]
+        
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > AVATAR_MAX_BYTES:
+            return error_response("File too large. Maximum size: 5MB", 413)
+        
+        existing_agent = await asyncio.to_thread(db.get_agent_by_id_cached, agent_id)
+        if not existing_agent or existing_agent["admin_id"] != user_id:
+            return error_response("Agent not found or unauthorized", 404)
+        
+        body = io.BytesIO()
+        async for chunk in request.stream():
+            body.write(chunk)
+            if body.tell() > AVATAR_MAX_BYTES:
+                return error_response("File too large. Maximum size: 5MB", 413)
+        
+        file_extension = sniff_image_extension(body.getbuffer()[:16].tobytes())
+        if not file_extension:
+            return error_response(INVALID_AVATAR_TYPE_MESSAGE, 400)
+        
+        body.seek(0)
+        new_avatar_key = await asyncio.to_thread(hetzner_storage.upload_avatar_fileobj, body, file_extension)
+        
+        result = await asyncio.to_thread(
+            db.update_agent_with_voice_type, agent_id, user_id, {"avatar_url": new_avatar_key}
+        )
+        if not result:
+            queue_avatar_delete(new_avatar_key)
+            return error_response("Update failed", 500)
+
+        await invalidate_agent_cache(user_id)
+        
+        old_avatar_key = existing_agent.get("avatar_url")
+        if old_avatar_key and old_avatar_key != new_avatar_key:
+            background_tasks.add_task(hetzner_storage.delete_avatar, old_avatar_key)
+        
+        result = serialize_agent_data(result)
+        add_presigned_urls_to_agent(result)
+        
+        return ORJSONResponse(
+            status_code=200,
+            content={
+                "success": True,
+                "message": "Avatar updated successfully",
+                "data": result
+            }
+        )
+        
+    except Exception as e:
+        logger.exception("Error replacing agent avatar")
+        return error_response("Failed to update avatar", 500)
+
 @router.delete("/agents/{agent_id}")
 async def delete_agent(
     agent_id: int,
@@ -1079,7 +1255,7 @@ async def delete_agent(
         user_id = current_user["id"]
         
         # Get agent details to find avatar
-        agent = db.get_agent_by_id(agent_id)
+        agent = db.get_agent_by_id_cached(agent_id)
         if not agent or agent["admin_id"] != user_id:
             return error_response("Agent not found or unauthorized", 404)
         
@@ -1088,17 +1264,15 @@ async def delete_agent(
         
         if not success:
             return error_response("Delete failed", 500)
+
+        await invalidate_agent_cache(user_id)
         
-        # Delete avatar from Hetzner if exists
+        # Delete avatar from Hetzner in the next batched DeleteObjects flush
         avatar_key = agent.get("avatar_url")
         if avatar_key:
-            try:
-                hetzner_storage.delete_avatar(avatar_key)
-                logging.info(f"🗑️ Avatar deleted for agent {agent_id}")
-            except Exception as e:
-                logging.warning(f"?? Could not delete avatar: {e}")
+            queue_avatar_delete(avatar_key)
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
             content={
                 "success": True,
@@ -1107,13 +1281,13 @@ async def delete_agent(
         )
         
     except Exception as e:
-        logging.error(f"Error deleting agent: {e}")
-        traceback.print_exc()
+        logger.exception("Error deleting agent")
         return error_response("Failed to delete agent", 500)
 
 @router.get("/calls/{call_id}")
 async def get_call_details(
     call_id: str,
+    request: Request,
     agent_id: Optional[int] = Query(None),
     current_user: dict = Depends(get_current_user)
 ):
@@ -1121,44 +1295,91 @@ async def get_call_details(
     try:
         user_id = current_user["id"]
         
-        call = db.get_call_by_id(call_id, agent_id)
+        # Ownership is checked in the same query (calls of other admins are simply not found)
+        call = db.get_call_by_id(call_id, agent_id, admin_id=user_id)
         
         if not call:
             return error_response("Call not found", 404)
         
-        # Verify ownership
-        agent = db.get_agent_by_id(call["agent_id"])
-        if not agent or agent["admin_id"] != user_id:
-            return error_response("Unauthorized", 403)
-        
-        # 🔥 FORMAT TIMESTAMPS BEFORE ADDING PRESIGNED URLS
-        for field in ["created_at", "started_at", "ended_at", "updated_at"]:
-            if call.get(field):
-                if hasattr(call[field], 'isoformat'):
-                    call[field] = call[field].isoformat()
-                else:
-                    call[field] = str(call[field])
+        # Row version + presign window: unchanged calls get a 304 while the
+        # client's cached presigned URLs are still valid
+        presign_window = int(time.time()) // CALL_DETAILS_ETAG_WINDOW
+        etag = f'W/"{call.pop("_version")}-{presign_window}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
         
         # 🔥 ADD PRESIGNED URLS
         call = add_presigned_urls_to_call(call)
         
-        return JSONResponse(
+        # Timestamps are passed through as datetimes; orjson emits ISO 8601
+        return ORJSONResponse(
             status_code=200,
             content={
                 "success": True,
                 "data": call
-            }
+            },
+            headers={"ETag": etag}
         )
     except Exception as e:
-        logging.error(f"Error fetching call details: {e}")
-        traceback.print_exc()  # Add this to see full error
+        logger.exception("Error fetching call details")
         return error_response("Failed to fetch call details", 500)
 
+async def _handle_room_end(data: dict, call_id: str):
+    """Finalize a call when its room closes. Duration comes from the agent via save-call-data."""
+    # The answering events may still be in flight, so re-read the cheap "answered?"
+    # check with backoff before the single finalizing UPDATE settles the status
+    for delay in WEBHOOK_ANSWERED_BACKOFF:
+        row = await db.get_call_answer_state_async(call_id)
+        if not row or row["status"] in FINAL_CALL_STATUSES:
+            logger.info("ℹ️ Call %s not found or already finalized, skipping webhook processing", call_id)
+            return ORJSONResponse({"message": "Call not found or already finalized"})
+        if row["answered"]:
+            break
+        await asyncio.sleep(delay)
+
+    final_status = await db.finalize_call_async(call_id)
+
+    if not final_status:
+        logger.info("ℹ️ Call %s finalized concurrently, skipping webhook processing", call_id)
+        return ORJSONResponse({"message": "Already finalized"})
+
+    logger.info("✅ Call %s marked as %s. Duration will be set by agent.", call_id, final_status)
+
+    return ORJSONResponse({"message": f"Call ended: {final_status}"})
+
+
+async def _handle_egress_ended(data: dict, call_id: str):
+    """Store the recording location once egress finishes."""
+    egress_info = data.get("egress_info", {}) or data.get("egressInfo", {})
+    file_results = egress_info.get("file_results", []) or egress_info.get("fileResults", [])
+
+    if file_results:
+        file_info = file_results[0] if isinstance(file_results, list) else file_results
+        location = file_info.get("location") or file_info.get("download_url")
+
+        if location:
+            await db.update_call_history_async(call_id, {"recording_url": location})
+            return ORJSONResponse({"message": "Recording saved"})
+
+    return ORJSONResponse({"message": f"{data.get('event')} processed"})
+
+
+async def _handle_default_event(data: dict, call_id: str):
+    return ORJSONResponse({"message": f"{data.get('event')} processed"})
+
+
+WEBHOOK_EVENT_HANDLERS = {
+    **{event: _handle_room_end for event in TERMINAL_WEBHOOK_EVENTS},
+    "egress_ended": _handle_egress_ended,
+}
+
+
 @router.post("/livekit-webhook")
 async def livekit_webhook(request: Request):
     """Handle LiveKit events for call lifecycle"""
+    event_key = None
     try:
-        data = await request.json()
+        data = orjson.loads(await request.body())
         event = data.get("event")
         room = data.get("room", {})
         call_id = room.get("name")
@@ -1168,82 +1389,33 @@ async def livekit_webhook(request: Request):
             egress_info = data.get("egress_info", {}) or data.get("egressInfo", {})
             call_id = egress_info.get("room_name") or egress_info.get("roomName")
             if not call_id:
-                return JSONResponse({"message": "No call_id"})
+                return ORJSONResponse({"message": "No call_id"})
 
-        # Always log event
-        add_call_event(call_id, event, data)
-        
-        # Ignore non-critical events
-        if event in ["room_started", "participant_joined", "egress_started", 
-                     "egress_updated", "track_published", "track_unpublished"]:
-            return JSONResponse({"message": f"{event} logged"})
-
-        # Handle room end WITHOUT calculating duration
-        # Duration will come from agent via save-call-data endpoint
-        if event in ["room_finished", "participant_left"]:
-            await asyncio.sleep(0.5)
-            
-            conn = db.get_connection()
-            try:
-                with conn.cursor() as cursor:
-                    cursor.execute("""
-                        SELECT status, events_log, agent_id, duration
-                        FROM call_history WHERE call_id = %s
-                    """, (call_id,))
-                    row = cursor.fetchone()
-            finally:
-                db.release_connection(conn)
-
-            if not row:
-                return JSONResponse({"message": "Call not found"})
-
-            current_status, events_log, agent_id, existing_duration = row
-            
-            # Skip if already final
-            if current_status in {"completed", "unanswered"}:
-                logging.info(f"ℹ️ Call {call_id} already finalized, skipping webhook processing")
-                return JSONResponse({"message": "Already finalized"})
+        # Drop replays of an event we already processed. Events with neither an id
+        # nor a timestamp cannot be told apart, so they are never deduplicated.
+        created_at = data.get("createdAt") or data.get("created_at")
+        event_key = data.get("id") or (f"{event}:{call_id}:{created_at}" if created_at else None)
+        if event_key:
+            if event_key in SEEN_WEBHOOK_EVENTS:
+                return ORJSONResponse({"message": "Duplicate event ignored"})
+            SEEN_WEBHOOK_EVENTS[event_key] = True
 
-            answered = check_if_answered(events_log)
-            final_status = "completed" if answered else "unanswered"
-            
-            # Don't calculate duration here - it will come from agent
-            updates = {
-                "status": final_status,
-                "ended_at": datetime.now(timezone.utc)
-            }
-            
-            # Only set duration to 0 for unanswered calls
-            if final_status == "unanswered":
-                updates["duration"] = 0
-            
-            db.update_call_history(call_id, updates)
-            
-            logging.info(
-                f"✅ Call {call_id} marked as {final_status}. "
-                f"Duration will be set by agent."
-            )
-            
-            return JSONResponse({"message": f"Call ended: {final_status}"})
+        # Always log event
+        await db.add_call_event_async(call_id, event, data)
 
-        elif event == "egress_ended":
-            egress_info = data.get("egress_info", {}) or data.get("egressInfo", {})
-            file_results = egress_info.get("file_results", []) or egress_info.get("fileResults", [])
-            
-            if file_results:
-                file_info = file_results[0] if isinstance(file_results, list) else file_results
-                location = file_info.get("location") or file_info.get("download_url")
-                
-                if location:
-                    db.update_call_history(call_id, {"recording_url": location})
-                    return JSONResponse({"message": "Recording saved"})
+        # Ignore non-critical events
+        if event in IGNORED_WEBHOOK_EVENTS:
+            return ORJSONResponse({"message": f"{event} logged"})
 
-        return JSONResponse({"message": f"{event} processed"})
+        handler = WEBHOOK_EVENT_HANDLERS.get(event, _handle_default_event)
+        return await handler(data, call_id)
 
     except Exception as e:
-        logging.error(f"Webhook error: {e}")
-        traceback.print_exc()
-        return JSONResponse({"error": str(e)}, status_code=500)
+        # Forget the event so LiveKit's retry of this 500 is processed again
+        if event_key:
+            SEEN_WEBHOOK_EVENTS.pop(event_key, None)
+        logger.exception("Webhook error")
+        return ORJSONResponse({"error": str(e)}, status_code=500)
     
 
 
@@ -1267,7 +1439,7 @@ async def get_agents_by_owner(
         for agent in agents:
             add_presigned_urls_to_agent(agent)
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
             content={
                 "success": True,
@@ -1278,8 +1450,7 @@ async def get_agents_by_owner(
         )
         
     except Exception as e:
-        logging.error(f"Error fetching agents by owner: {e}")
-        traceback.print_exc()
+        logger.exception("Error fetching agents by owner")
         return error_response("Failed to fetch agents by owner", 500)
     
 
@@ -1315,7 +1486,7 @@ async def book_appointment(request: Request):
         owner_name = agent.get("owner_name", "Business Owner")
         
         # Send email to CUSTOMER
-        customer_email_sent = await mail_obj.send_email_with_calendar_event(
+        customer_mail = mail_obj.send_email_with_calendar_event(
             attendee_email=customer_email,
             attendee_name=customer_name,
             appointment_date=appointment_date,
@@ -1327,30 +1498,34 @@ async def book_appointment(request: Request):
             organizer_email=owner_email or customer_email
         )
         
-        # 🔥 Send email to OWNER (using dedicated function)
+        # 🔥 Send email to OWNER (using dedicated function), concurrently with the customer mail
         owner_email_sent = False
         if owner_email:
-            owner_email_sent = await mail_obj.send_owner_appointment_notification(
-                owner_email=owner_email,
-                owner_name=owner_name,
-                customer_name=customer_name,
-                customer_email=customer_email,
-                customer_phone=customer_phone,
-                appointment_date=appointment_date,
-                start_time=start_time,
-                end_time=end_time,
-                title=title,
-                description=description
+            customer_email_sent, owner_email_sent = await asyncio.gather(
+                customer_mail,
+                mail_obj.send_owner_appointment_notification(
+                    owner_email=owner_email,
+                    owner_name=owner_name,
+                    customer_name=customer_name,
+                    customer_email=customer_email,
+                    customer_phone=customer_phone,
+                    appointment_date=appointment_date,
+                    start_time=start_time,
+                    end_time=end_time,
+                    title=title,
+                    description=description
+                ),
             )
             
-            logging.info(
-                f"📧 Appointment emails sent - "
-                f"Customer: {customer_email_sent}, Owner: {owner_email_sent}"
+            logger.info(
+                "📧 Appointment emails sent - Customer: %s, Owner: %s",
+                customer_email_sent, owner_email_sent
             )
         else:
-            logging.warning(f"⚠️ No owner_email for agent {user_id}, skipping owner notification")
+            customer_email_sent = await customer_mail
+            logger.warning("⚠️ No owner_email for agent %s, skipping owner notification", user_id)
         
-        return JSONResponse({
+        return ORJSONResponse({
             "success": True,
             "message": "Appointment booked successfully",
             "emails_sent": {
@@ -1360,8 +1535,7 @@ async def book_appointment(request: Request):
         })
         
     except Exception as e:
-        logging.error(f"Error booking appointment: {e}")
-        traceback.print_exc()
+        logger.exception("Error booking appointment")
         return error_response(f"Failed to book appointment: {str(e)}", status_code=500)
     
 
@@ -1371,17 +1545,14 @@ async def forgot_password(request: ForgotPasswordRequest):
     try:
         email = request.email.strip().lower()
         
-        conn = db.get_connection()
-        try:
+        with db.get_connection_context() as conn:
             with conn.cursor() as cursor:
                 cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
                 user = cursor.fetchone()
-        finally:
-            db.release_connection(conn)
         
         if not user:
-            logging.warning(f"Password reset requested for non-existent email: {email}")
-            return JSONResponse({
+            logger.warning("Password reset requested for non-existent email: %s", email)
+            return ORJSONResponse({
                 "success": True,
                 "message": "If that email exists, a reset link has been sent."
             })
@@ -1389,18 +1560,15 @@ async def forgot_password(request: ForgotPasswordRequest):
         from src.utils.jwt_utils import create_password_reset_token
         reset_token = create_password_reset_token(email)
         
-        frontend_url = os.getenv("FRONTEND_URL", "https://www.mrbot-ki.de")
-        mail_obj = Send_Mail()  
-        email_sent = await mail_obj.send_password_reset_email(email, reset_token, frontend_url)
+        email_sent = await mail_obj.send_password_reset_email(email, reset_token, FRONTEND_URL)
         
-        return JSONResponse({
+        return ORJSONResponse({
             "success": True,
             "message": "If that email exists, a reset link has been sent."
         })
         
     except Exception as e:
-        logging.error(f"Error in forgot password: {e}")
-        traceback.print_exc()
+        logger.exception("Error in forgot password")
         return error_response("Failed to process request", 500)
 
 @router.post("/reset-password")
@@ -1417,7 +1585,7 @@ async def reset_password(request: ResetPasswordRequest):
         # Update password
         db.update_user_password(email, request.new_password)
         
-        return JSONResponse({
+        return ORJSONResponse({
             "success": True,
             "message": "Password updated successfully. You can now login."
         })
@@ -1425,8 +1593,7 @@ async def reset_password(request: ResetPasswordRequest):
     except ValueError as e:
         return error_response(str(e), 400)
     except Exception as e:
-        logging.error(f"Error resetting password: {e}")
-        traceback.print_exc()
+        logger.exception("Error resetting password")
         return error_response("Failed to reset password", 500)
     
 # @router.post("/admin/migrate-voices-from-json")
@@ -1515,7 +1682,7 @@ async def reset_password(request: ResetPasswordRequest):
 #         logger.info(f"   Skipped (duplicates): {skipped_count}")
 #         logger.info(f"   Failed: {len(failed)}")
         
-#         return JSONResponse({
+#         return ORJSONResponse({
 #             "success": True,
 #             "message": f"Successfully migrated {inserted_count} voice samples!",
 #             "summary": {
@@ -1790,7 +1957,7 @@ async def reset_password(request: ResetPasswordRequest):
 #         logger.info("🧹 Cleaned up temp files")
         
 #         # ==================== RESPONSE ====================
-#         return JSONResponse({
+#         return ORJSONResponse({
 #             "success": True,
 #             "message": f"✅ Successfully uploaded {saved_count} voice samples!",
 #             "summary": {
@@ -1833,27 +2000,18 @@ async def get_voice_samples(language: Optional[str] = Query(None)):
         else:
             samples = db.get_all_voice_samples()
         
-        # Add presigned URLs (valid for 24 hours)
+        # Add presigned URLs (valid for 24 hours) and group by language
+        # for easier frontend consumption, in a single pass
+        grouped = {}
         for sample in samples:
             if sample.get("audio_blob_path"):
                 sample["audio_url"] = generate_presigned_url(
                     sample["audio_blob_path"],
                     expiration=86400  # 24 hours
                 )
-            
-            # Format timestamp
-            if sample.get("created_at"):
-                sample["created_at"] = sample["created_at"].isoformat()
-        
-        # Group by language for easier frontend consumption
-        grouped = {}
-        for sample in samples:
-            lang = sample["language"]
-            if lang not in grouped:
-                grouped[lang] = []
-            grouped[lang].append(sample)
+            grouped.setdefault(sample["language"], []).append(sample)
         
-        return JSONResponse({
+        return ORJSONResponse({
             "success": True,
             "total": len(samples),
             "grouped_by_language": grouped,
@@ -1861,8 +2019,7 @@ async def get_voice_samples(language: Optional[str] = Query(None)):
         })
         
     except Exception as e:
-        logging.error(f"Error fetching voice samples: {e}")
-        traceback.print_exc()
+        logger.exception("Error fetching voice samples")
         return error_response("Failed to fetch voice samples", 500)
     
 
@@ -1888,13 +2045,14 @@ async def reset_agent_minutes(
         
         # Reset minutes
         db.reset_agent_minutes(agent_id, user_id)
+        await invalidate_agent_cache(user_id)
         
-        logging.info(
-            f"✅ Agent {agent_id} minutes reset by admin {user_id}. "
-            f"Was: {old_used}/{allowed} min, Now: 0/{allowed} min"
+        logger.info(
+            "✅ Agent %s minutes reset by admin %s. Was: %s/%s min, Now: 0/%s min",
+            agent_id, user_id, old_used, allowed, allowed
         )
         
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=200,
             content={
                 "success": True,
@@ -1912,8 +2070,7 @@ async def reset_agent_minutes(
     except ValueError as e:
         return error_response(str(e), 400)
     except Exception as e:
-        logging.error(f"Error resetting agent minutes: {e}")
-        traceback.print_exc()
+        logger.exception("Error resetting agent minutes")
         return error_response("Failed to reset minutes", 500)
     
 
@@ -1925,13 +2082,10 @@ async def submit_contact_form(request: ContactFormRequest):
     No authentication required
     """
     try:
-        BUSINESS_EMAIL = os.getenv("BUSINESS_EMAIL", "info@mrbot-ki.de")
-        
         if not request.first_name or not request.last_name or not request.email:
             return error_response("First name, last name, and email are required", 400)
         
         # Send email to business
-        mail_obj = Send_Mail()
         email_sent = await mail_obj.send_contact_form_email(
             first_name=request.first_name,
             last_name=request.last_name,
@@ -1941,17 +2095,16 @@ async def submit_contact_form(request: ContactFormRequest):
         )
         
         if not email_sent:
-            logging.error(f"Failed to send contact form email from {request.email}")
+            logger.error("Failed to send contact form email from %s", request.email)
             return error_response("Failed to send message. Please try again.", 500)
         
-        logging.info(f"✅ Contact form submitted by {request.first_name} {request.last_name} ({request.email})")
+        logger.info("✅ Contact form submitted by %s %s (%s)", request.first_name, request.last_name, request.email)
         
-        return JSONResponse({
+        return ORJSONResponse({
             "success": True,
             "message": "Thank you for contacting us! We'll get back to you soon."
         })
         
     except Exception as e:
-        logging.error(f"Error processing contact form: {e}")
-        traceback.print_exc()
+        logger.exception("Error processing contact form")
         return error_response("Failed to submit contact form", 500)
\ No newline at end of file
@@ -0,0 +1,65 @@
+import os
+import logging
+from typing import Optional
+
+import redis.asyncio as redis
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Small Redis cache for rendered JSON response bodies.
+
+    Enabled only when REDIS_URL is set; otherwise every lookup is a miss and
+    writes are dropped, so the endpoints behave exactly as without a cache.
+    Redis errors are logged and treated as misses - the cache must never
+    fail a request.
+    """
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or os.getenv("REDIS_URL")
+        self._redis = redis.from_url(self.url) if self.url else None
+        if self._redis:
+            logger.info("✅ Response cache enabled (Redis)")
+
+    @property
+    def enabled(self) -> bool:
+        return self._redis is not None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if not self._redis:
+            return None
+        try:
+            return await self._redis.get(key)
+        except Exception as e:
+            logger.exception("⚠️ Cache get failed for %s", key)
+            return None
+
+    async def set(self, key: str, value: bytes, ttl_seconds: int):
+        if not self._redis:
+            return
+        try:
+            await self._redis.set(key, value, ex=ttl_seconds)
+        except Exception as e:
+            logger.exception("⚠️ Cache set failed for %s", key)
+
+    async def delete_pattern(self, pattern: str):
+        """Delete every key matching a glob pattern (SCAN, never KEYS)."""
+        if not self._redis:
+            return
+        try:
+            keys = [key async for key in self._redis.scan_iter(match=pattern, count=500)]
+            if keys:
+                await self._redis.delete(*keys)
+        except Exception as e:
+            logger.exception("⚠️ Cache invalidation failed for %s", pattern)
+
+    async def close(self):
+        if self._redis:
+            await self._redis.aclose()
+
+
+response_cache = ResponseCache()
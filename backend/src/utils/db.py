@@ -1,22 +1,48 @@
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 import bcrypt
 import urllib.parse
-import json
+import orjson
+import asyncpg
 import psycopg2
 from psycopg2 import pool 
 import logging
+import threading
+from cachetools import TTLCache
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
-import traceback
 from contextlib import contextmanager
 
 
 load_dotenv()
+logger = logging.getLogger(__name__)
+
+# A call counts as answered once its recording started or a SIP participant joined
+ANSWERED_EVENTS_JSONPATH = (
+    '$[*] ? (@.event == "egress_started"'
+    ' || (@.event == "participant_joined" && @.data.participant.identity starts with "sip-"))'
+)
+
+# Columns for the call-history pages. Display duration (falls back to ended_at - started_at
+# when none was reported) and has_recording are computed here so the endpoints pass rows through;
+# the computed duration overrides ch.duration in the returned dict.
+CALL_HISTORY_COLUMNS = """
+    ch.*, a.agent_name, a.phone_number,
+    CASE
+        WHEN COALESCE(ch.duration, 0) = 0 AND ch.started_at IS NOT NULL AND ch.ended_at IS NOT NULL
+            THEN ROUND(EXTRACT(EPOCH FROM (ch.ended_at - ch.started_at))::numeric, 1)::double precision
+        ELSE ch.duration
+    END AS duration,
+    COALESCE(ch.recording_blob, '') <> '' AS has_recording
+"""
 
 class PGDB:
     _instance = None
     _pool = None
+    _async_pool = None
+    # Short-lived agent rows for ownership checks; every agent write below invalidates its entry
+    _agent_cache = TTLCache(maxsize=4096, ttl=5)
+    _agent_cache_lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
@@ -61,6 +87,123 @@ class PGDB:
         finally:
             self.release_connection(conn)
 
+    # ==================== ASYNC POOL (asyncpg) ====================
+    # Hot paths called from async endpoints use this pool so the event loop
+    # is never blocked on a query. Opened/closed by the app lifespan.
+    async def open_async_pool(self):
+        if PGDB._async_pool is None:
+            PGDB._async_pool = await asyncpg.create_pool(
+                self.connection_string,
+                min_size=5,
+                max_size=20,
+                max_inactive_connection_lifetime=300,
+                # asyncpg prepares every query and caches the plan per connection,
+                # keyed by query text; keep room for all the hot point lookups
+                statement_cache_size=1024,
+            )
+            logger.info("✅ asyncpg pool ready")
+
+    async def close_async_pool(self):
+        if PGDB._async_pool is not None:
+            await PGDB._async_pool.close()
+            PGDB._async_pool = None
+
+    @staticmethod
+    def _require_async_pool():
+        if PGDB._async_pool is None:
+            raise RuntimeError("async pool not opened - call open_async_pool() first")
+        return PGDB._async_pool
+
+    async def fetchrow(self, query: str, *args):
+        """Run a query on the async pool and return the first row (asyncpg Record) or None"""
+        async with self._require_async_pool().acquire() as conn:
+            return await conn.fetchrow(query, *args)
+
+    async def execute(self, query: str, *args):
+        """Run a statement on the async pool and return its status string"""
+        async with self._require_async_pool().acquire() as conn:
+            return await conn.execute(query, *args)
+
+    async def update_call_history_async(self, call_id: str, updates: dict, keep_existing: tuple = ()):
+        """
+        Single-statement UPDATE of call_history on the async pool.
+        Columns listed in keep_existing are only written when currently NULL
+        (COALESCE), so "set once" fields need no prior SELECT.
+        """
+        if not updates:
+            return None
+
+        set_clauses = []
+        param_values = []
+        for key, value in updates.items():
+            if not key.replace('_', '').isalnum():
+                raise ValueError(f"Invalid column name: {key}")
+            param_values.append(value)
+            placeholder = f"${len(param_values)}"
+            if key in keep_existing:
+                set_clauses.append(f"{key} = COALESCE({key}, {placeholder})")
+            else:
+                set_clauses.append(f"{key} = {placeholder}")
+
+        param_values.append(call_id)
+        sql = f"UPDATE call_history SET {', '.join(set_clauses)} WHERE call_id = ${len(param_values)}"
+        return await self.execute(sql, *param_values)
+
+    async def add_call_event_async(self, call_id: str, event_type: str, event_data: dict = None):
+        """
+        Append an event to call_history.events_log (deduplicated by event type) in one UPDATE,
+        without reading the log back. Returns True if the event was stored.
+        """
+        status = await self.execute("""
+            UPDATE call_history
+            SET events_log = COALESCE(events_log, '[]'::jsonb) || jsonb_build_array(jsonb_build_object(
+                'event', $2::text,
+                'timestamp', $3::text,
+                'data', $4::jsonb
+            ))
+            WHERE call_id = $1
+              AND NOT COALESCE(events_log, '[]'::jsonb) @> jsonb_build_array(jsonb_build_object('event', $2::text))
+        """, call_id, event_type, datetime.now(timezone.utc).isoformat(), orjson.dumps(event_data or {}).decode())
+        stored = status == "UPDATE 1"
+        if not stored:
+            logger.info("Event %s not stored for %s (duplicate or unknown call)", event_type, call_id)
+        return stored
+
+    async def get_call_answer_state_async(self, call_id: str):
+        """
+        Read a call's status and whether it was answered (recording started, or a
+        sip- participant joined), decided from events_log inside Postgres.
+        Returns a record with status/answered, or None if the call does not exist.
+        """
+        return await self.fetchrow(f"""
+            SELECT status, COALESCE(events_log, '[]'::jsonb) @? '{ANSWERED_EVENTS_JSONPATH}' AS answered
+            FROM call_history
+            WHERE call_id = $1
+        """, call_id)
+
+    async def finalize_call_async(self, call_id: str):
+        """
+        Mark a call completed/unanswered when its room ends, in one UPDATE.
+        "Answered" is decided from events_log with the same jsonpath predicate, so the
+        log never leaves Postgres; calls that are already final are left untouched.
+        Returns the new status, or None if nothing was updated.
+        """
+        row = await self.fetchrow(f"""
+            UPDATE call_history
+            SET status = CASE WHEN answered THEN 'completed' ELSE 'unanswered' END,
+                ended_at = CURRENT_TIMESTAMP,
+                duration = CASE WHEN answered THEN duration ELSE 0 END
+            FROM (
+                SELECT COALESCE(events_log, '[]'::jsonb) @? '{ANSWERED_EVENTS_JSONPATH}' AS answered
+                FROM call_history
+                WHERE call_id = $1
+            ) AS log
+            WHERE call_id = $1
+              AND COALESCE(status, '') NOT IN ('completed', 'unanswered')
+            RETURNING status
+        """, call_id)
+        return row["status"] if row else None
+
     # ==================== NEW: AGENTS TABLE ====================
     def create_agents_table(self):
         """
@@ -95,9 +238,9 @@ class PGDB:
                         ON agents(admin_id);
                     """)
                 conn.commit()
-                logging.info("✅ agents table created with avatar_url")
+                logger.info("✅ agents table created with avatar_url")
             except Exception as e:
-                logging.error(f"Error creating agents table: {e}")
+                logger.exception("Error creating agents table")
 
     def get_agent_by_phone(self, phone_number: str):
         """
@@ -154,10 +297,11 @@ class PGDB:
                     """, (agent_id, admin_id))
                     row = cursor.fetchone()
                 conn.commit()
+                self.invalidate_cached_agent(agent_id)
                 return bool(row)
             except Exception as e:
                 conn.rollback()
-                logging.error(f"Error deleting agent: {e}")
+                logger.exception("Error deleting agent")
                 raise
 
     # ==================== USERS TABLE ====================
@@ -180,7 +324,7 @@ class PGDB:
                     """)
                 conn.commit()
             except Exception as e:
-                logging.error(f"Error creating users table: {e}")
+                logger.exception("Error creating users table")
 
     def register_user(self, user_data):
         with self.get_connection_context() as conn:
@@ -218,7 +362,7 @@ class PGDB:
 
             except Exception as e:
                 conn.rollback()
-                logging.error(f"Error in register_user: {e}")
+                logger.exception("Error in register_user")
                 raise
 
     def login_user(self, user_data):
@@ -246,7 +390,7 @@ class PGDB:
                     else:
                         raise ValueError("Invalid username or password.")
             except Exception as e:
-                logging.error(f"Error during login: {str(e)}")
+                logger.exception("Error during login")
                 raise
 
     def get_user_by_id(self, user_id: int):
@@ -286,12 +430,17 @@ class PGDB:
                             agent_events JSONB DEFAULT '[]'
                         );
                     """)
-                    cursor.execute("CREATE INDEX IF NOT EXISTS idx_call_history_agent_id ON call_history(agent_id);")
+                    # Flattened "Speaker: text" transcript, written once at ingest for the history views
+                    cursor.execute("ALTER TABLE call_history ADD COLUMN IF NOT EXISTS transcript_text TEXT;")
+                    # Serves both agent_id lookups and the per-agent "ORDER BY created_at DESC" pages,
+                    # so it replaces the old single-column agent_id index
+                    cursor.execute("CREATE INDEX IF NOT EXISTS idx_call_history_agent_created ON call_history(agent_id, created_at DESC, id DESC);")
+                    cursor.execute("DROP INDEX IF EXISTS idx_call_history_agent_id;")
                     cursor.execute("CREATE INDEX IF NOT EXISTS idx_call_history_events_log ON call_history USING GIN (events_log);")
                     cursor.execute("CREATE INDEX IF NOT EXISTS idx_call_history_agent_events ON call_history USING GIN (agent_events);")
                 conn.commit()
             except Exception as e:
-                logging.error(f"Error creating call_history table: {e}")
+                logger.exception("Error creating call_history table")
 
     def generate_presigned_url(blob_path: str, expiration: int = 3600) -> str:
         """
@@ -314,11 +463,11 @@ class PGDB:
                 ExpiresIn=expiration
             )
             
-            logging.info(f"✅ Generated presigned URL (expires in {expiration}s): {blob_path}")
+            logger.info("✅ Generated presigned URL (expires in %ss): %s", expiration, blob_path)
             return url
             
         except Exception as e:
-            logging.error(f"❌ Failed to generate presigned URL: {e}")
+            logger.exception("❌ Failed to generate presigned URL")
             return None
 
     def insert_call_history(
@@ -345,14 +494,14 @@ class PGDB:
                     return row[0] if row else None
 
             except Exception as e:
-                logging.error(f"Error inserting call history: {e}")
+                logger.exception("Error inserting call history")
                 conn.rollback()
                 raise
 
     def update_call_history(self, call_id: str, updates: dict):
         """Update specific fields in the call_history record based on the call_id"""
         if not updates:
-            logging.warning("update_call_history called with no updates.")
+            logger.warning("update_call_history called with no updates.")
             return None
 
         with self.get_connection_context() as conn:
@@ -362,18 +511,18 @@ class PGDB:
                     param_values = []
                     for key, value in updates.items():
                         if not key.replace('_', '').isalnum():
-                            logging.error(f"Invalid column name detected: {key}")
+                            logger.error("Invalid column name detected: %s", key)
                             raise ValueError(f"Invalid column name: {key}")
 
                         if key == 'transcript' and value is not None:
                             set_clauses.append(f"{key} = %s")
-                            param_values.append(json.dumps(value))
+                            param_values.append(orjson.dumps(value).decode())
                         else:
                             set_clauses.append(f"{key} = %s")
                             param_values.append(value)
 
                     if not set_clauses:
-                        logging.warning("No valid fields to update.")
+                        logger.warning("No valid fields to update.")
                         return None
 
                     set_sql = ", ".join(set_clauses)
@@ -383,17 +532,19 @@ class PGDB:
                     cursor.execute(sql, tuple(param_values))
                     row = cursor.fetchone()
                     conn.commit()
-                    logging.info(f"Updated call_history for call_id {call_id}. Updated fields: {list(updates.keys())}")
+                    logger.info("Updated call_history for call_id %s. Updated fields: %s", call_id, list(updates.keys()))
                     return row[0] if row else None
 
             except Exception as e:
                 conn.rollback()
-                logging.error(f"Error updating call history for call_id={call_id}: {e}")
-                traceback.print_exc()
+                logger.exception("Error updating call history for call_id=%s", call_id)
                 raise
 
-    def get_call_history_by_agent(self, agent_id: int, page: int = 1, page_size: int = 10):
-        """Get paginated call history for a specific agent"""
+    def get_call_history_by_agent(self, agent_id: int, page: int = 1, page_size: int = 10, before: tuple = None):
+        """
+        Get paginated call history for a specific agent.
+        before=(created_at, id) of the last row already shown seeks past it instead of using OFFSET.
+        """
         with self.get_connection_context() as conn:
             try:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
@@ -409,16 +560,26 @@ class PGDB:
                     completed_calls = cursor.fetchone()["count"]
                     not_completed_calls = total - completed_calls
 
-                    # Paginated query
-                    offset = (page - 1) * page_size
-                    cursor.execute("""
-                        SELECT ch.*, a.agent_name, a.phone_number
-                        FROM call_history ch
-                        JOIN agents a ON ch.agent_id = a.id
-                        WHERE ch.agent_id = %s
-                        ORDER BY ch.created_at DESC
-                        LIMIT %s OFFSET %s
-                    """, (agent_id, page_size, offset))
+                    # Paginated query (keyset when a cursor is given, OFFSET otherwise)
+                    if before:
+                        cursor.execute(f"""
+                            SELECT {CALL_HISTORY_COLUMNS}
+                            FROM call_history ch
+                            JOIN agents a ON ch.agent_id = a.id
+                            WHERE ch.agent_id = %s AND (ch.created_at, ch.id) < (%s, %s)
+                            ORDER BY ch.created_at DESC, ch.id DESC
+                            LIMIT %s
+                        """, (agent_id, before[0], before[1], page_size))
+                    else:
+                        offset = (page - 1) * page_size
+                        cursor.execute(f"""
+                            SELECT {CALL_HISTORY_COLUMNS}
+                            FROM call_history ch
+                            JOIN agents a ON ch.agent_id = a.id
+                            WHERE ch.agent_id = %s
+                            ORDER BY ch.created_at DESC, ch.id DESC
+                            LIMIT %s OFFSET %s
+                        """, (agent_id, page_size, offset))
 
                     rows = cursor.fetchall()
 
@@ -426,9 +587,9 @@ class PGDB:
                     for row in rows:
                         if isinstance(row["transcript"], str):
                             try:
-                                row["transcript"] = json.loads(row["transcript"])
+                                row["transcript"] = orjson.loads(row["transcript"])
                             except Exception:
-                                logging.warning(f"Invalid JSON in transcript for call_id={row['call_id']}")
+                                logger.warning("Invalid JSON in transcript for call_id=%s", row['call_id'])
 
                     return {
                         "calls": rows,
@@ -436,14 +597,18 @@ class PGDB:
                         "completed_calls": completed_calls,
                         "not_completed_calls": not_completed_calls,
                         "page": page,
-                        "page_size": page_size
+                        "page_size": page_size,
+                        "next_cursor": (rows[-1]["created_at"], rows[-1]["id"]) if len(rows) == page_size else None
                     }
             except Exception as e:
-                logging.error(f"Error fetching call history for agent_id={agent_id}: {e}")
+                logger.exception("Error fetching call history for agent_id=%s", agent_id)
                 raise
 
-    def get_call_history_by_admin(self, admin_id: int, page: int = 1, page_size: int = 10):
-        """Get paginated call history for all agents under an admin"""
+    def get_call_history_by_admin(self, admin_id: int, page: int = 1, page_size: int = 10, before: tuple = None):
+        """
+        Get paginated call history for all agents under an admin.
+        before=(created_at, id) of the last row already shown seeks past it instead of using OFFSET.
+        """
         with self.get_connection_context() as conn:
             try:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
@@ -464,16 +629,26 @@ class PGDB:
                     completed_calls = cursor.fetchone()["count"]
                     not_completed_calls = total - completed_calls
 
-                    # Paginated query
-                    offset = (page - 1) * page_size
-                    cursor.execute("""
-                        SELECT ch.*, a.agent_name, a.phone_number
-                        FROM call_history ch
-                        JOIN agents a ON ch.agent_id = a.id
-                        WHERE a.admin_id = %s
-                        ORDER BY ch.created_at DESC
-                        LIMIT %s OFFSET %s
-                    """, (admin_id, page_size, offset))
+                    # Paginated query (keyset when a cursor is given, OFFSET otherwise)
+                    if before:
+                        cursor.execute(f"""
+                            SELECT {CALL_HISTORY_COLUMNS}
+                            FROM call_history ch
+                            JOIN agents a ON ch.agent_id = a.id
+                            WHERE a.admin_id = %s AND (ch.created_at, ch.id) < (%s, %s)
+                            ORDER BY ch.created_at DESC, ch.id DESC
+                            LIMIT %s
+                        """, (admin_id, before[0], before[1], page_size))
+                    else:
+                        offset = (page - 1) * page_size
+                        cursor.execute(f"""
+                            SELECT {CALL_HISTORY_COLUMNS}
+                            FROM call_history ch
+                            JOIN agents a ON ch.agent_id = a.id
+                            WHERE a.admin_id = %s
+                            ORDER BY ch.created_at DESC, ch.id DESC
+                            LIMIT %s OFFSET %s
+                        """, (admin_id, page_size, offset))
 
                     rows = cursor.fetchall()
 
@@ -481,7 +656,7 @@ class PGDB:
                     for row in rows:
                         if isinstance(row["transcript"], str):
                             try:
-                                row["transcript"] = json.loads(row["transcript"])
+                                row["transcript"] = orjson.loads(row["transcript"])
                             except Exception:
                                 pass
 
@@ -491,16 +666,21 @@ class PGDB:
                         "completed_calls": completed_calls,
                         "not_completed_calls": not_completed_calls,
                         "page": page,
-                        "page_size": page_size
+                        "page_size": page_size,
+                        "next_cursor": (rows[-1]["created_at"], rows[-1]["id"]) if len(rows) == page_size else None
                     }
             except Exception as e:
-                logging.error(f"Error fetching call history for admin_id={admin_id}: {e}")
+                logger.exception("Error fetching call history for admin_id=%s", admin_id)
                 raise
 
-    def get_call_by_id(self, call_id: str, agent_id: int = None):
-        """Get a specific call by ID"""
+    def get_call_by_id(self, call_id: str, agent_id: int = None, admin_id: int = None):
+        """
+        Get a specific call by ID.
+        With admin_id, only returns the call if its agent belongs to that admin (ownership check in the same query).
+        _version is the row's xmin, which changes on every write; it is used for ETags.
+        """
         query = """
-            SELECT ch.*, a.agent_name, a.phone_number
+            SELECT ch.*, ch.xmin::text AS _version, a.agent_name, a.phone_number
             FROM call_history ch
             JOIN agents a ON ch.agent_id = a.id
             WHERE ch.call_id = %s
@@ -511,6 +691,10 @@ class PGDB:
             query += " AND ch.agent_id = %s"
             params.append(agent_id)
         
+        if admin_id is not None:
+            query += " AND a.admin_id = %s"
+            params.append(admin_id)
+        
         with self.get_connection_context() as conn:
             try:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
@@ -519,13 +703,13 @@ class PGDB:
                     
                     if result and isinstance(result.get("transcript"), str):
                         try:
-                            result["transcript"] = json.loads(result["transcript"])
+                            result["transcript"] = orjson.loads(result["transcript"])
                         except:
                             pass
                     
                     return result
             except Exception as e:
-                logging.error(f"Error getting call by ID: {e}")
+                logger.exception("Error getting call by ID")
                 raise
 
     def get_agent_by_id(self, agent_id: int):
@@ -539,6 +723,25 @@ class PGDB:
                 """, (agent_id,))
                 return cursor.fetchone()
 
+    def get_agent_by_id_cached(self, agent_id: int):
+        """
+        get_agent_by_id behind a 5s TTL cache, for ownership checks on hot endpoints.
+        Returns a copy so callers can't modify the cached row.
+        """
+        with PGDB._agent_cache_lock:
+            agent = PGDB._agent_cache.get(agent_id)
+        if agent is None:
+            agent = self.get_agent_by_id(agent_id)
+            if agent is None:
+                return None
+            with PGDB._agent_cache_lock:
+                PGDB._agent_cache[agent_id] = agent
+        return dict(agent)
+
+    def invalidate_cached_agent(self, agent_id: int):
+        with PGDB._agent_cache_lock:
+            PGDB._agent_cache.pop(agent_id, None)
+
     def get_agents_with_analytics(self, admin_id: int):
         """Get all agents with their call statistics"""
         with self.get_connection_context() as conn:
@@ -598,7 +801,7 @@ class PGDB:
                     
                     return agents
             except Exception as e:
-                logging.error(f"Error fetching agents with analytics: {e}")
+                logger.exception("Error fetching agents with analytics")
                 raise
 
     def get_agent_analytics(self, agent_id: int):
@@ -637,7 +840,7 @@ class PGDB:
                     
                     return result
             except Exception as e:
-                logging.error(f"Error fetching agent analytics: {e}")
+                logger.exception("Error fetching agent analytics")
                 raise
 
     def get_admin_dashboard_analytics(self, admin_id: int):
@@ -730,7 +933,7 @@ class PGDB:
                         ]
                     }
             except Exception as e:
-                logging.error(f"Error fetching dashboard analytics: {e}")
+                logger.exception("Error fetching dashboard analytics")
                 raise
 
 
@@ -796,13 +999,6 @@ class PGDB:
                         agent["total_duration"] = round(float(agent["total_duration"]), 1)
                         agent["used_minutes"] = round(float(agent["used_minutes"]), 2)
                         
-                        if agent["created_at"]:
-                            agent["created_at"] = agent["created_at"].isoformat()
-                        if agent["updated_at"]:
-                            agent["updated_at"] = agent["updated_at"].isoformat()
-                        if agent["last_call_at"]:
-                            agent["last_call_at"] = agent["last_call_at"].isoformat()
-                        
                         # Format time fields
                         if agent.get("business_hours_start"):
                             agent["business_hours_start"] = str(agent["business_hours_start"])
@@ -818,7 +1014,7 @@ class PGDB:
                     }
                     
             except Exception as e:
-                logging.error(f"Error fetching agents with stats: {e}")
+                logger.exception("Error fetching agents with stats")
                 raise
         
 
@@ -877,7 +1073,7 @@ class PGDB:
                     return agents
                     
             except Exception as e:
-                logging.error(f"Error fetching top agents: {e}")
+                logger.exception("Error fetching top agents")
                 raise
 
 
@@ -902,12 +1098,6 @@ class PGDB:
                     if not agent:
                         return None
                     
-                    # Format agent data
-                    if agent["created_at"]:
-                        agent["created_at"] = agent["created_at"].isoformat()
-                    if agent["updated_at"]:
-                        agent["updated_at"] = agent["updated_at"].isoformat()
-                    
                     # Get call statistics
                     cursor.execute("""
                         SELECT 
@@ -929,8 +1119,8 @@ class PGDB:
                         "unanswered_calls": stats["unanswered_calls"],
                         "avg_duration": round(float(stats["avg_duration"]), 1),
                         "total_duration": round(float(stats["total_duration"]), 1),
-                        "first_call_at": stats["first_call_at"].isoformat() if stats["first_call_at"] else None,
-                        "last_call_at": stats["last_call_at"].isoformat() if stats["last_call_at"] else None
+                        "first_call_at": stats["first_call_at"],
+                        "last_call_at": stats["last_call_at"]
                     }
                     
                     # Get paginated call history - INCLUDE recording_blob and transcript_blob
@@ -958,14 +1148,6 @@ class PGDB:
                     
                     calls = cursor.fetchall()
                     
-                    for call in calls:
-                        if call["created_at"]:
-                            call["created_at"] = call["created_at"].isoformat()
-                        if call["started_at"]:
-                            call["started_at"] = call["started_at"].isoformat()
-                        if call["ended_at"]:
-                            call["ended_at"] = call["ended_at"].isoformat()
-                    
                     # Get total call count for pagination
                     cursor.execute("SELECT COUNT(*) as total FROM call_history WHERE agent_id = %s", (agent_id,))
                     total_calls = cursor.fetchone()["total"]
@@ -981,13 +1163,14 @@ class PGDB:
                     return agent
                     
             except Exception as e:
-                logging.error(f"Error fetching agent detail: {e}")
+                logger.exception("Error fetching agent detail")
                 raise
            
 
     def create_agent_with_voice_type(self, agent_data: dict):
         """
         Create agent with new fields: owner_email, business hours, minutes.
+        Returns None if the phone number is already taken (checked atomically by the UNIQUE constraint).
         """
         with self.get_connection_context() as conn:
             try:
@@ -1002,6 +1185,7 @@ class PGDB:
                             admin_id
                         )
                         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        ON CONFLICT (phone_number) DO NOTHING
                         RETURNING *;
                     """, (
                         agent_data["phone_number"],
@@ -1021,11 +1205,14 @@ class PGDB:
                     ))
                     result = cursor.fetchone()
                 conn.commit()
-                logging.info(f"✅ Created agent {result['id']} with minutes limit")
+                if not result:
+                    logger.warning("⚠️ Phone number already in use: %s", agent_data['phone_number'])
+                    return None
+                logger.info("✅ Created agent %s with minutes limit", result['id'])
                 return result
             except Exception as e:
                 conn.rollback()
-                logging.error(f"Error creating agent: {e}")
+                logger.exception("Error creating agent")
                 raise
 
         
@@ -1081,12 +1268,13 @@ class PGDB:
                     result = cursor.fetchone()
                 
                 conn.commit()
-                logging.info(f"✅ Updated agent {agent_id}")
+                self.invalidate_cached_agent(agent_id)
+                logger.info("✅ Updated agent %s", agent_id)
                 return result
                 
             except Exception as e:
                 conn.rollback()
-                logging.error(f"Error updating agent: {e}")
+                logger.exception("Error updating agent")
                 raise
        
 
@@ -1145,7 +1333,7 @@ class PGDB:
                     return agents
                     
             except Exception as e:
-                logging.error(f"Error fetching agents by owner name: {e}")
+                logger.exception("Error fetching agents by owner name")
                 raise
        
 
@@ -1172,11 +1360,11 @@ class PGDB:
                     """, (hashed_password.decode('utf-8'), email))
                     
                     conn.commit()
-                    logging.info(f"✅ Password updated for {email}")
+                    logger.info("✅ Password updated for %s", email)
                     return True
             except Exception as e:
                 conn.rollback()
-                logging.error(f"Error updating password: {e}")
+                logger.exception("Error updating password")
                 raise
         
 
@@ -1210,9 +1398,9 @@ class PGDB:
                         ON voice_samples(gender);
                     """)
                 conn.commit()
-                logging.info("✅ voice_samples table created")
+                logger.info("✅ voice_samples table created")
             except Exception as e:
-                logging.error(f"Error creating voice_samples table: {e}")
+                logger.exception("Error creating voice_samples table")
         
 
     def insert_voice_sample(self, voice_data: dict):
@@ -1240,11 +1428,11 @@ class PGDB:
                     ))
                     result = cursor.fetchone()
                 conn.commit()
-                logging.info(f"✅ Voice sample saved: {voice_data['voice_name']}")
+                logger.info("✅ Voice sample saved: %s", voice_data['voice_name'])
                 return result
             except Exception as e:
                 conn.rollback()
-                logging.error(f"Error inserting voice sample: {e}")
+                logger.exception("Error inserting voice sample")
                 raise
         
 
@@ -1362,10 +1550,10 @@ class PGDB:
                     """)
                     
                 conn.commit()
-                logging.info("✅ Agent fields added/verified successfully")
+                logger.info("✅ Agent fields added/verified successfully")
             except Exception as e:
                 conn.rollback()
-                logging.error(f"❌ Error adding agent fields: {e}")
+                logger.exception("❌ Error adding agent fields")
                 raise
 
     def check_agent_minutes_available(self, agent_id: int) -> dict:
@@ -1427,15 +1615,14 @@ class PGDB:
                     
                     result = cursor.fetchone()
                 conn.commit()
+                self.invalidate_cached_agent(agent_id)
                 
                 if result:
-                    logging.info(
-                        f"✅ Agent {agent_id}: Used minutes updated to {result[1]}/{result[2]}"
-                    )
+                    logger.info("✅ Agent %s: Used minutes updated to %s/%s", agent_id, result[1], result[2])
                 return result
             except Exception as e:
                 conn.rollback()
-                logging.error(f"❌ Error updating used minutes: {e}")
+                logger.exception("❌ Error updating used minutes")
                 raise
 
     def reset_agent_minutes(self, agent_id: int, admin_id: int):
@@ -1469,12 +1656,13 @@ class PGDB:
                     
                     result = cursor.fetchone()
                 conn.commit()
+                self.invalidate_cached_agent(agent_id)
                 
-                logging.info(f"✅ Agent {agent_id} minutes reset (limit: {result[1]} min)")
+                logger.info("✅ Agent %s minutes reset (limit: %s min)", agent_id, result[1])
                 return True
             except Exception as e:
                 conn.rollback()
-                logging.error(f"❌ Error resetting minutes: {e}")
+                logger.exception("❌ Error resetting minutes")
                 raise
 
     def get_agent_with_minutes_check(self, agent_id: int):
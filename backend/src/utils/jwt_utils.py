@@ -3,6 +3,8 @@ from datetime import datetime, timedelta
 from jose import jwt, JWTError
 import logging
 
+logger = logging.getLogger(__name__)
+
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your_dev_secret_key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 500  
@@ -18,8 +20,8 @@ def decode_access_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         return payload
-    except JWTError as e:
-        logging.error(f"JWT decode error: {e}")
+    except JWTError:
+        logger.exception("JWT decode error")
         return None
     
 
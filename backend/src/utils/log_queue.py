@@ -0,0 +1,28 @@
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+def start_log_listener() -> QueueListener:
+    """
+    Route the root logger through a queue so request handlers only enqueue records.
+
+    The root logger's current handlers (or a basic stderr handler if there are none)
+    are moved behind a QueueListener, which formats and writes them on its own thread
+    instead of on the event loop.
+    """
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    if not handlers:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        handlers = [stream_handler]
+
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
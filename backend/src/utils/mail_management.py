@@ -1,4 +1,6 @@
+import asyncio
 import smtplib
+import threading
 import logging
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -10,16 +12,82 @@ from dotenv import load_dotenv
 import os
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 MAIL_SENDER = os.getenv("MAIL_SENDER")
 MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
 TIMEZONE = os.getenv("TIMEZONE", "CET")
 
+# Authenticated SMTP sessions shared by every Send_Mail instance, so a send
+# skips the TCP + STARTTLS + login round-trips when a session is idle.
+SMTP_POOL_SIZE = 4
+_SMTP_POOL = []
+_SMTP_POOL_LOCK = threading.Lock()
+
+_UTC = pytz.UTC
+
+
+def _ics_utc(dt: datetime) -> str:
+    return f"{dt.year:04d}{dt.month:02d}{dt.day:02d}T{dt.hour:02d}{dt.minute:02d}{dt.second:02d}Z"
+
 class Send_Mail:
     def __init__(self):
         self.MAIL_SENDER = MAIL_SENDER
         self.EMAIL_PASSWORD = MAIL_PASSWORD
         self.TIMEZONE = TIMEZONE
         self.timeout = 30  # Increased for reliability
+        self.tz = pytz.timezone(TIMEZONE)
+
+    def _ics_times(self, appointment_date: str, start_time: str, end_time: str):
+        """DTSTAMP, DTSTART and DTEND (UTC, basic format) for an invite."""
+        start_dt = self.tz.localize(datetime.strptime(f"{appointment_date} {start_time}", "%Y-%m-%d %H:%M"))
+        end_dt = self.tz.localize(datetime.strptime(f"{appointment_date} {end_time}", "%Y-%m-%d %H:%M"))
+        return (
+            _ics_utc(datetime.now(_UTC)),
+            _ics_utc(start_dt.astimezone(_UTC)),
+            _ics_utc(end_dt.astimezone(_UTC)),
+        )
+
+    def _connect(self):
+        server = smtplib.SMTP("smtp.gmail.com", 587, timeout=self.timeout)
+        try:
+            server.ehlo()
+            server.starttls()
+            server.ehlo()
+            server.login(self.MAIL_SENDER, self.EMAIL_PASSWORD)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def _deliver(self, msg):
+        """Blocking SMTP send; always called through asyncio.to_thread."""
+        with _SMTP_POOL_LOCK:
+            server = _SMTP_POOL.pop() if _SMTP_POOL else None
+
+        if server is not None:
+            try:
+                server.send_message(msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # Gmail drops idle sessions; retry once on a fresh connection
+                server.close()
+                server = None
+            except Exception:
+                server.close()
+                raise
+
+        if server is None:
+            server = self._connect()
+            try:
+                server.send_message(msg)
+            except Exception:
+                server.close()
+                raise
+
+        with _SMTP_POOL_LOCK:
+            if len(_SMTP_POOL) < SMTP_POOL_SIZE:
+                _SMTP_POOL.append(server)
+                return
+        server.quit()
 
     async def send_email(
         self,
@@ -37,20 +105,12 @@ class Send_Mail:
                 msg.attach(MIMEText(plain_body, "plain"))
             msg.attach(MIMEText(html_body, "html"))
 
-            server = smtplib.SMTP("smtp.gmail.com", 587, timeout=self.timeout)
-            try:
-                server.ehlo()
-                server.starttls()
-                server.ehlo()
-                server.login(self.MAIL_SENDER, self.EMAIL_PASSWORD)
-                server.send_message(msg)
-            finally:
-                server.quit()
+            await asyncio.to_thread(self._deliver, msg)
 
-            logging.info(f" Email sent to {to_email}")
+            logger.info(" Email sent to %s", to_email)
             return True
         except Exception as e:
-            logging.error(f" Error sending email: {e}")
+            logger.exception(" Error sending email")
             return False
 
     async def send_email_with_calendar_event(
@@ -66,12 +126,7 @@ class Send_Mail:
         organizer_email: str,
     ):
         try:
-            tz = pytz.timezone(self.TIMEZONE)
-            start_dt = tz.localize(datetime.strptime(f"{appointment_date} {start_time}", "%Y-%m-%d %H:%M"))
-            end_dt = tz.localize(datetime.strptime(f"{appointment_date} {end_time}", "%Y-%m-%d %H:%M"))
-            dtstamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-            dtstart = start_dt.astimezone(pytz.UTC).strftime("%Y%m%dT%H%M%SZ")
-            dtend = end_dt.astimezone(pytz.UTC).strftime("%Y%m%dT%H%M%SZ")
+            dtstamp, dtstart, dtend = self._ics_times(appointment_date, start_time, end_time)
             uid = f"{dtstamp}@{organizer_email.split('@')[1]}"
            
             ics_content = f"""BEGIN:VCALENDAR
@@ -141,20 +196,12 @@ END:VCALENDAR
             ics_part.add_header("Content-Class", "urn:content-classes:calendarmessage")
             msg.attach(ics_part)
 
-            server = smtplib.SMTP("smtp.gmail.com", 587, timeout=self.timeout)
-            try:
-                server.ehlo()
-                server.starttls()
-                server.ehlo()
-                server.login(self.MAIL_SENDER, self.EMAIL_PASSWORD)
-                server.send_message(msg)
-            finally:
-                server.quit()
+            await asyncio.to_thread(self._deliver, msg)
 
-            logging.info(f" Email with calendar invite sent to {attendee_email}")
+            logger.info(" Email with calendar invite sent to %s", attendee_email)
             return True
         except Exception as e:
-            logging.error(f" Error sending email with calendar event: {e}")
+            logger.exception(" Error sending email with calendar event")
             return False
 
     async def send_password_reset_email(self, email: str, reset_token: str, frontend_url: str = "https://www.mrbot-ki.de"):
@@ -202,7 +249,7 @@ END:VCALENDAR
             return await self.send_email(email, subject, html_body, plain_body)
            
         except Exception as e:
-            logging.error(f" Failed to send reset email: {e}")
+            logger.exception(" Failed to send reset email")
             return False
         
 
@@ -224,12 +271,7 @@ END:VCALENDAR
         Includes customer details for owner's reference.
         """
         try:
-            tz = pytz.timezone(self.TIMEZONE)
-            start_dt = tz.localize(datetime.strptime(f"{appointment_date} {start_time}", "%Y-%m-%d %H:%M"))
-            end_dt = tz.localize(datetime.strptime(f"{appointment_date} {end_time}", "%Y-%m-%d %H:%M"))
-            dtstamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-            dtstart = start_dt.astimezone(pytz.UTC).strftime("%Y%m%dT%H%M%SZ")
-            dtend = end_dt.astimezone(pytz.UTC).strftime("%Y%m%dT%H%M%SZ")
+            dtstamp, dtstart, dtend = self._ics_times(appointment_date, start_time, end_time)
             uid = f"{dtstamp}@{owner_email.split('@')[1]}"
         
             ics_content = f"""BEGIN:VCALENDAR
@@ -321,21 +363,13 @@ END:VCALENDAR
             ics_part.add_header("Content-Class", "urn:content-classes:calendarmessage")
             msg.attach(ics_part)
 
-            server = smtplib.SMTP("smtp.gmail.com", 587, timeout=self.timeout)
-            try:
-                server.ehlo()
-                server.starttls()
-                server.ehlo()
-                server.login(self.MAIL_SENDER, self.EMAIL_PASSWORD)
-                server.send_message(msg)
-            finally:
-                server.quit()
+            await asyncio.to_thread(self._deliver, msg)
 
-            logging.info(f"📧 Owner notification sent to {owner_email}")
+            logger.info("📧 Owner notification sent to %s", owner_email)
             return True
             
         except Exception as e:
-            logging.error(f"❌ Error sending owner notification: {e}")
+            logger.exception("❌ Error sending owner notification")
             return False
 
 
@@ -504,12 +538,12 @@ END:VCALENDAR
             )
             
             if success:
-                logging.info(f"📧 Contact form email sent to {recipient_email} from {customer_email}")
+                logger.info("📧 Contact form email sent to %s from %s", recipient_email, customer_email)
             else:
-                logging.error(f"❌ Failed to send contact form email from {customer_email}")
+                logger.error("❌ Failed to send contact form email from %s", customer_email)
             
             return success
             
         except Exception as e:
-            logging.error(f"❌ Error sending contact form email: {e}")
+            logger.exception("❌ Error sending contact form email")
             return False
\ No newline at end of file
@@ -6,13 +6,16 @@ from src.utils.jwt_utils import decode_access_token
 import logging
 import os 
 import json
+import gzip
+import asyncio
+import orjson
 import base64
-import httpx
-import traceback
 from datetime import datetime, timezone  
+from functools import lru_cache
 
 from src.utils.db import PGDB
 
+logger = logging.getLogger(__name__)
 db = PGDB()
 auth_scheme = HTTPBearer()
 # oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
@@ -23,62 +26,137 @@ auth_scheme = HTTPBearer()
 import boto3
 from botocore.exceptions import ClientError
 
+# Read once at import (.env is already loaded by src.utils.db)
+HETZNER_ENDPOINT_URL = os.getenv("HETZNER_ENDPOINT_URL")
+HETZNER_ACCESS_KEY = os.getenv("HETZNER_ACCESS_KEY")
+HETZNER_SECRET_KEY = os.getenv("HETZNER_SECRET_KEY")
+HETZNER_BUCKET_NAME = os.getenv("HETZNER_BUCKET_NAME")
+HETZNER_REGION = os.getenv("HETZNER_REGION", "hel1")
+
+@lru_cache(maxsize=1)
 def get_s3_client():
-    """Initialize S3-compatible client for Hetzner Object Storage"""
-    endpoint = os.getenv("HETZNER_ENDPOINT_URL")
-    access_key = os.getenv("HETZNER_ACCESS_KEY")
-    secret_key = os.getenv("HETZNER_SECRET_KEY")
-    
-    if not all([endpoint, access_key, secret_key]):
+    """Shared S3-compatible client for Hetzner Object Storage (boto3 clients are thread-safe)"""
+    if not all([HETZNER_ENDPOINT_URL, HETZNER_ACCESS_KEY, HETZNER_SECRET_KEY]):
         raise RuntimeError("Missing Hetzner credentials")
     
     return boto3.client(
         's3',
-        endpoint_url=endpoint,
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key,
-        region_name=os.getenv("HETZNER_REGION", "hel1")
+        endpoint_url=HETZNER_ENDPOINT_URL,
+        aws_access_key_id=HETZNER_ACCESS_KEY,
+        aws_secret_access_key=HETZNER_SECRET_KEY,
+        region_name=HETZNER_REGION
     )
 
 async def _fetch_from_s3_blob(blob_name: str) -> bytes:
     """Download file from Hetzner using blob name"""
     try:
         s3_client = get_s3_client()
-        bucket_name = os.getenv("HETZNER_BUCKET_NAME")
+        bucket_name = HETZNER_BUCKET_NAME
         
         response = s3_client.get_object(Bucket=bucket_name, Key=blob_name)
         data = response['Body'].read()
         
-        logging.info(f"✅ Downloaded {len(data)} bytes from Hetzner: {blob_name}")
+        logger.info("✅ Downloaded %s bytes from Hetzner: %s", len(data), blob_name)
         return data
             
     except ClientError as e:
-        logging.error(f"❌ S3 download failed for {blob_name}: {e}")
-        traceback.print_exc()
+        logger.exception("❌ S3 download failed for %s", blob_name)
+        return None
+
+def encode_cursor(position) -> str | None:
+    """Opaque pagination token for a (created_at, id) position, or None at the last page."""
+    if not position:
+        return None
+    created_at, row_id = position
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{row_id}".encode()).decode()
+
+def decode_cursor(token: str) -> tuple:
+    """Inverse of encode_cursor. Raises ValueError on a malformed token."""
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(token.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+def _content_text(content) -> str:
+    if isinstance(content, list):
+        return " ".join(content)
+    return "" if content is None else str(content)
+
+def build_transcript_text(transcript) -> str | None:
+    """
+    Flatten a transcript into "Speaker: text" lines.
+    Accepts a list of messages or the agent's {"items": [...]} export (raw JSON is parsed first).
+    Returns None if the shape is not recognised.
+    """
+    if isinstance(transcript, (str, bytes)):
+        transcript = orjson.loads(transcript)
+    if isinstance(transcript, dict):
+        transcript = transcript.get("items") or transcript.get("messages") or []
+    if not isinstance(transcript, list):
         return None
 
+    # Single list comprehension: no per-message append/attribute lookups
+    return "\n".join([
+        f"{'Assistant' if msg.get('role') == 'assistant' else 'User'}: {_content_text(msg.get('content'))}"
+        for msg in transcript
+        if msg.get("type") == "message"
+    ])
+
+async def wait_for_blob(blob_name: str, timeout: float = 30.0) -> bool:
+    """
+    Poll the bucket with HEAD requests until the blob exists.
+    Backs off exponentially (0.25s → 4s); returns False if it never shows up within timeout.
+    """
+    s3_client = get_s3_client()
+    bucket_name = HETZNER_BUCKET_NAME
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    delay = 0.25
+    
+    while True:
+        try:
+            await asyncio.to_thread(s3_client.head_object, Bucket=bucket_name, Key=blob_name)
+            return True
+        except ClientError:
+            pass
+        
+        if loop.time() + delay > deadline:
+            return False
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 4.0)
+
 async def fetch_and_store_transcript(call_id: str, transcript_url: str = None, transcript_blob: str = None):
-    """Download transcript from Hetzner blob"""
+    """Download transcript from Hetzner blob as soon as it is available"""
     try:
         transcript_data = None
         
         if transcript_blob:
-            logging.info(f"📥 Downloading transcript from blob: {transcript_blob}")
+            if not await wait_for_blob(transcript_blob):
+                logger.error("❌ Transcript blob never appeared for %s: %s", call_id, transcript_blob)
+                return None
+            
+            logger.info("📥 Downloading transcript from blob: %s", transcript_blob)
             try:
                 s3_client = get_s3_client()
-                bucket_name = os.getenv("HETZNER_BUCKET_NAME")
+                bucket_name = HETZNER_BUCKET_NAME
+                
+                def download():
+                    response = s3_client.get_object(Bucket=bucket_name, Key=transcript_blob)
+                    return response['Body'].read()
                 
-                response = s3_client.get_object(Bucket=bucket_name, Key=transcript_blob)
-                transcript_json = response['Body'].read().decode('utf-8')
-                transcript_data = json.loads(transcript_json)
-                logging.info(f"✅ Downloaded transcript from blob")
+                transcript_bytes = await asyncio.to_thread(download)
+                # Newer agents upload gzip-compressed transcripts (Content-Encoding: gzip)
+                if transcript_bytes[:2] == b'\x1f\x8b':
+                    transcript_bytes = gzip.decompress(transcript_bytes)
+                transcript_data = orjson.loads(transcript_bytes)
+                logger.info("✅ Downloaded transcript from blob")
                 
             except ClientError as e:
-                logging.error(f"❌ Blob download failed: {e}")
-                traceback.print_exc()
+                logger.exception("❌ Blob download failed")
                 return None
         else:
-            logging.warning(f"⚠️ No transcript_blob provided for {call_id}")
+            logger.warning("⚠️ No transcript_blob provided for %s", call_id)
             return None
         
         # Rest of function remains same...
@@ -91,19 +169,25 @@ async def fetch_and_store_transcript(call_id: str, transcript_url: str = None, t
                 has_content = len(transcript_data) > 0
             
             if has_content:
-                db.update_call_history(call_id, {"transcript": transcript_data})
-                logging.info(f"✅ Transcript stored ({len(str(transcript_data))} chars)")
+                # transcript_bytes is already the JSON text, so it goes to the JSONB column as-is
+                await db.update_call_history_async(call_id, {
+                    "transcript": transcript_bytes.decode(),
+                    "transcript_text": build_transcript_text(transcript_data)
+                })
+                logger.info("✅ Transcript stored (%s bytes)", len(transcript_bytes))
             else:
-                logging.warning(f"⚠️ Empty transcript for {call_id}")
-                db.update_call_history(call_id, {"transcript": {"items": [], "note": "No conversation"}})
+                logger.warning("⚠️ Empty transcript for %s", call_id)
+                await db.update_call_history_async(call_id, {
+                    "transcript": orjson.dumps({"items": [], "note": "No conversation"}).decode(),
+                    "transcript_text": ""
+                })
             
             return transcript_data
         
         return None
         
     except Exception as e:
-        logging.error(f"❌ Error fetching transcript: {e}")
-        traceback.print_exc()
+        logger.exception("❌ Error fetching transcript")
         return None
 
 # Update fetch_and_store_recording function
@@ -113,37 +197,37 @@ async def fetch_and_store_recording(call_id: str, recording_url: str = None, rec
     NO DOWNLOAD NEEDED!
     """
     try:
-        logging.info(f"🎵 Recording path already stored: {recording_blob_name}")
+        logger.info("🎵 Recording path already stored: %s", recording_blob_name)
         
         # Path is already in DB from agent upload
         # We only verify it exists
         if recording_blob_name:
             s3_client = get_s3_client()
-            bucket_name = os.getenv("HETZNER_BUCKET_NAME")
+            bucket_name = HETZNER_BUCKET_NAME
             
             try:
                 s3_client.head_object(Bucket=bucket_name, Key=recording_blob_name)
-                logging.info(f"✅ Recording exists in Hetzner: {recording_blob_name}")
+                logger.info("✅ Recording exists in Hetzner: %s", recording_blob_name)
             except ClientError:
-                logging.warning(f"⚠️ Recording not found in bucket: {recording_blob_name}")
+                logger.warning("⚠️ Recording not found in bucket: %s", recording_blob_name)
         
     except Exception as e:
-        logging.error(f"❌ Error verifying recording: {e}")
+        logger.exception("❌ Error verifying recording")
 
 def get_current_user(token: HTTPAuthorizationCredentials = Depends(auth_scheme)):
     # Token decode step
     try:
-        logging.info(f"token: {token}")
+        logger.info("token: %s", token)
         payload = decode_access_token(token.credentials)
         if not payload or "sub" not in payload:
-            logging.warning("JWT decode failed or missing 'sub' claim.")
+            logger.warning("JWT decode failed or missing 'sub' claim.")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid or expired token",
                 headers={"WWW-Authenticate": "Bearer"},
             )
     except Exception as e:
-        logging.error(f"JWT decode error: {e}")
+        logger.exception("JWT decode error")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired token",
@@ -155,14 +239,14 @@ def get_current_user(token: HTTPAuthorizationCredentials = Depends(auth_scheme))
     try:
         user = db.get_user_by_id(user_id)
         if not user:
-            logging.warning(f"User not found in DB for user_id: {user_id}")
+            logger.warning("User not found in DB for user_id: %s", user_id)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found.",
             )
         return user
     except Exception as e:
-        logging.error(f"Database error while fetching user_id {user_id}: {e}")
+        logger.exception("Database error while fetching user_id %s", user_id)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error while fetching user"
@@ -190,7 +274,7 @@ def is_admin(current_user=Depends(get_current_user)):
                 detail="You do not have permission to perform this action."
             )
     except Exception as e:
-        logging.error(f"Error checking admin status for user : {e}")
+        logger.exception("Error checking admin status for user")
         raise HTTPException(
             status_code=500,
             detail=f"{e}"
@@ -198,45 +282,6 @@ def is_admin(current_user=Depends(get_current_user)):
 
     return current_user
 
-def add_call_event(call_id: str, event_type: str, event_data: dict = None):
-    """Store event in call_history.events_log (deduplicated)"""
-    conn = db.get_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT events_log FROM call_history WHERE call_id = %s", (call_id,))
-            row = cursor.fetchone()
-            if not row:
-                logging.warning(f"Call {call_id} not found for event {event_type}")
-                return
-
-            events_log = row[0] or []
-            if isinstance(events_log, str):
-                try:
-                    events_log = json.loads(events_log)
-                except Exception:
-                    events_log = []
-
-            if any(ev.get("event") == event_type for ev in events_log):
-                logging.info(f"Duplicate event {event_type} ignored for {call_id}")
-                return
-
-            events_log.append({
-                "event": event_type,
-                "timestamp": datetime.utcnow().isoformat(),
-                "data": event_data or {}
-            })
-
-            cursor.execute(
-                "UPDATE call_history SET events_log = %s WHERE call_id = %s",
-                (json.dumps(events_log), call_id)
-            )
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        logging.error(f"Error adding call event: {e}")
-    finally:
-        db.release_connection(conn)  # ✅ 
-
 import os
 import asyncio
 from dotenv import load_dotenv
@@ -248,7 +293,7 @@ def calculate_duration(started_at, ended_at) -> float:
     Handles None values, various timestamp formats, and timezone issues.
     """
     if not started_at or not ended_at:
-        logging.warning(f"⚠️ Missing timestamps: start={started_at}, end={ended_at}")
+        logger.warning("⚠️ Missing timestamps: start=%s, end=%s", started_at, ended_at)
         return 0
     
     try:
@@ -260,7 +305,7 @@ def calculate_duration(started_at, ended_at) -> float:
         elif isinstance(started_at, datetime):
             start_dt = started_at if started_at.tzinfo else started_at.replace(tzinfo=timezone.utc)
         else:
-            logging.error(f"❌ Invalid started_at type: {type(started_at)}")
+            logger.error("❌ Invalid started_at type: %s", type(started_at))
             return 0
         
         if isinstance(ended_at, (int, float)):
@@ -270,7 +315,7 @@ def calculate_duration(started_at, ended_at) -> float:
         elif isinstance(ended_at, datetime):
             end_dt = ended_at if ended_at.tzinfo else ended_at.replace(tzinfo=timezone.utc)
         else:
-            logging.error(f"❌ Invalid ended_at type: {type(ended_at)}")
+            logger.error("❌ Invalid ended_at type: %s", type(ended_at))
             return 0
         
         # Calculate duration
@@ -278,64 +323,34 @@ def calculate_duration(started_at, ended_at) -> float:
         
         # Sanity check
         if duration < 0:
-            logging.warning(f"⚠️ Negative duration: {duration}s (end before start)")
+            logger.warning("⚠️ Negative duration: %ss (end before start)", duration)
             return 0
         
         if duration > 86400:  # More than 24 hours
-            logging.warning(f"⚠️ Suspiciously long duration: {duration}s")
+            logger.warning("⚠️ Suspiciously long duration: %ss", duration)
         
         return round(max(0, duration), 1)
         
     except Exception as e:
-        logging.error(f"❌ Error calculating duration: {e}")
-        logging.error(f"   started_at: {started_at} ({type(started_at)})")
-        logging.error(f"   ended_at: {ended_at} ({type(ended_at)})")
-        traceback.print_exc()
+        logger.exception(
+            "❌ Error calculating duration (started_at=%r, ended_at=%r)", started_at, ended_at
+        )
         return 0
     
     
-def check_if_answered(events_log) -> bool:
+@lru_cache(maxsize=8)
+def _get_presign_client(endpoint_url: str, access_key: str, secret_key: str):
     """
-    Determine if call was actually answered by checking events_log.
-    
-    ⚠️ CRITICAL: We can ONLY check events_log because transcript 
-    doesn't exist yet when room_ended fires!
-    
-    Returns True if:
-    - SIP participant joined (means they picked up)
-    - Recording started (egress_started means call was answered)
+    Presigning is a local SigV4 computation, so one client per endpoint can be
+    reused for every URL instead of building a new boto3 client each time.
     """
-    if not events_log:
-        logging.warning("⚠️ No events_log - assuming unanswered")
-        return False
-    
-    try:
-        events = json.loads(events_log) if isinstance(events_log, str) else events_log
-        
-        # ✅ Check if recording started (definitive proof)
-        egress_started = any(ev.get("event") == "egress_started" for ev in events)
-        
-        # ✅ Check if SIP participant joined (they picked up)
-        sip_participant_joined = False
-        for ev in events:
-            if ev.get("event") == "participant_joined":
-                participant = ev.get("data", {}).get("participant", {})
-                identity = participant.get("identity", "")
-                if identity.startswith("sip-"):
-                    sip_participant_joined = True
-                    break
-        
-        # ✅ Either condition means call was answered
-        answered = egress_started or sip_participant_joined
-        
-        logging.info(f"📊 Answered check: egress={egress_started}, sip_joined={sip_participant_joined} → {answered}")
-        
-        return answered
-        
-    except Exception as e:
-        logging.error(f"❌ Error parsing events_log: {e}")
-        return False
-    
+    return boto3.client(
+        's3',
+        endpoint_url=endpoint_url,
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        region_name=HETZNER_REGION
+    )
 
 def generate_presigned_url(blob_path: str, expiration: int = 3600) -> str:
     """
@@ -349,10 +364,10 @@ def generate_presigned_url(blob_path: str, expiration: int = 3600) -> str:
         Presigned URL string
     """
     try:
-        endpoint = os.getenv("HETZNER_ENDPOINT_URL")
-        access_key = os.getenv("HETZNER_ACCESS_KEY")
-        secret_key = os.getenv("HETZNER_SECRET_KEY")
-        bucket_name = os.getenv("HETZNER_BUCKET_NAME")
+        endpoint = HETZNER_ENDPOINT_URL
+        access_key = HETZNER_ACCESS_KEY
+        secret_key = HETZNER_SECRET_KEY
+        bucket_name = HETZNER_BUCKET_NAME
         
         # 🔥 FIX: For recordings, use path-style endpoint (without bucket subdomain)
         # For other files (avatars, transcripts), use virtual-hosted style
@@ -363,13 +378,7 @@ def generate_presigned_url(blob_path: str, expiration: int = 3600) -> str:
             # Keep virtual-hosted style for transcripts and avatars
             endpoint_for_presign = endpoint
         
-        s3_client = boto3.client(
-            's3',
-            endpoint_url=endpoint_for_presign,
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            region_name=os.getenv("HETZNER_REGION", "hel1")
-        )
+        s3_client = _get_presign_client(endpoint_for_presign, access_key, secret_key)
         
         url = s3_client.generate_presigned_url(
             'get_object',
@@ -377,12 +386,11 @@ def generate_presigned_url(blob_path: str, expiration: int = 3600) -> str:
             ExpiresIn=expiration
         )
         
-        logging.info(f"✅ Generated presigned URL (expires in {expiration}s): {blob_path}")
+        logger.info("✅ Generated presigned URL (expires in %ss): %s", expiration, blob_path)
         return url
         
     except Exception as e:
-        logging.error(f"❌ Failed to generate presigned URL: {e}")
-        traceback.print_exc()
+        logger.exception("❌ Failed to generate presigned URL")
         return None
 
 
@@ -396,15 +404,41 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+AVATAR_CONTENT_TYPES = {
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp'
+}
+
+AVATAR_MAX_BYTES = 5 * 1024 * 1024
+
+
+def sniff_image_extension(head: bytes):
+    """
+    Detect the image type from the file's leading bytes rather than trusting the filename.
+    Returns one of the AVATAR_CONTENT_TYPES keys, or None if it is not a supported image.
+    """
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
 class HetznerAvatarStorage:
     """
     Hetzner Object Storage Handler for Avatars
     Stores only the object key, generates presigned URLs on-demand
     """
     def __init__(self):
-        self.bucket_name = os.getenv("HETZNER_BUCKET_NAME")
+        self.bucket_name = HETZNER_BUCKET_NAME
         self.s3_client = get_s3_client()
-        logging.info(f"✅ Hetzner Avatar Storage initialized: {self.bucket_name}")
+        logger.info("✅ Hetzner Avatar Storage initialized: %s", self.bucket_name)
     
     def upload_avatar(self, file_content: bytes, file_extension: str) -> str:
         """
@@ -416,14 +450,7 @@ class HetznerAvatarStorage:
         try:
             filename = f"avatars/{uuid.uuid4()}.{file_extension}"
             
-            content_type_map = {
-                'jpg': 'image/jpeg',
-                'jpeg': 'image/jpeg',
-                'png': 'image/png',
-                'gif': 'image/gif',
-                'webp': 'image/webp'
-            }
-            content_type = content_type_map.get(file_extension.lower(), 'application/octet-stream')
+            content_type = AVATAR_CONTENT_TYPES.get(file_extension.lower(), 'application/octet-stream')
             
             self.s3_client.put_object(
                 Bucket=self.bucket_name,
@@ -433,11 +460,38 @@ class HetznerAvatarStorage:
                 CacheControl='public, max-age=31536000'
             )
             
-            logging.info(f"✅ Uploaded avatar: {filename}")
+            logger.info("✅ Uploaded avatar: %s", filename)
             return filename  # Return KEY, not URL
             
         except Exception as e:
-            logging.error(f"❌ Avatar upload failed: {e}")
+            logger.exception("❌ Avatar upload failed")
+            raise
+    
+    def upload_avatar_fileobj(self, fileobj, file_extension: str) -> str:
+        """
+        Stream an avatar from a file-like object (multipart for large bodies) and return the object key.
+        Blocking - call it from a worker thread.
+        """
+        try:
+            filename = f"avatars/{uuid.uuid4()}.{file_extension}"
+            
+            content_type = AVATAR_CONTENT_TYPES.get(file_extension.lower(), 'application/octet-stream')
+            
+            self.s3_client.upload_fileobj(
+                fileobj,
+                self.bucket_name,
+                filename,
+                ExtraArgs={
+                    'ContentType': content_type,
+                    'CacheControl': 'public, max-age=31536000'
+                }
+            )
+            
+            logger.info("✅ Uploaded avatar: %s", filename)
+            return filename
+            
+        except Exception as e:
+            logger.exception("❌ Avatar upload failed")
             raise
     
     def delete_avatar(self, object_key: str) -> bool:
@@ -452,15 +506,112 @@ class HetznerAvatarStorage:
                 Bucket=self.bucket_name,
                 Key=object_key
             )
-            logging.info(f"✅ Deleted avatar: {object_key}")
+            logger.info("✅ Deleted avatar: %s", object_key)
             return True
         except Exception as e:
-            logging.error(f"❌ Delete failed: {e}")
+            logger.exception("❌ Delete failed")
             return False
+    
+    def delete_avatars(self, object_keys: list) -> int:
+        """
+        Delete many avatars with DeleteObjects (up to 1000 keys per request).
+        Returns the number of objects deleted; failures are logged, never raised.
+        """
+        deleted = 0
+        for i in range(0, len(object_keys), 1000):
+            batch = object_keys[i:i + 1000]
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+                errors = response.get("Errors", [])
+                for error in errors:
+                    logger.error("❌ Delete failed for %s: %s", error.get('Key'), error.get('Message'))
+                deleted += len(batch) - len(errors)
+            except Exception as e:
+                logger.exception("❌ Batch delete failed")
+        logger.info("✅ Deleted %s avatar(s)", deleted)
+        return deleted
+    
+    def presign_avatar_upload(self, file_extension: str, expiration: int = 300) -> dict:
+        """
+        Presigned POST so the browser uploads the avatar straight to the bucket.
+        The policy pins the key, the content type and the 5MB size limit.
+        
+        Returns:
+            {"url": ..., "fields": {...}, "avatar_key": "avatars/uuid.jpg"}
+        """
+        filename = f"avatars/{uuid.uuid4()}.{file_extension}"
+        content_type = AVATAR_CONTENT_TYPES[file_extension.lower()]
+        
+        post = self.s3_client.generate_presigned_post(
+            Bucket=self.bucket_name,
+            Key=filename,
+            Fields={
+                'Content-Type': content_type,
+                'Cache-Control': 'public, max-age=31536000'
+            },
+            Conditions=[
+                ['content-length-range', 1, AVATAR_MAX_BYTES],
+                {'Content-Type': content_type},
+                {'Cache-Control': 'public, max-age=31536000'}
+            ],
+            ExpiresIn=expiration
+        )
+        
+        return {"url": post["url"], "fields": post["fields"], "avatar_key": filename}
+    
+    def verify_avatar_upload(self, object_key: str) -> bool:
+        """
+        Confirm a browser-uploaded avatar exists and is a small image (HEAD only, no download).
+        """
+        if not object_key.startswith("avatars/"):
+            return False
+        try:
+            head = self.s3_client.head_object(Bucket=self.bucket_name, Key=object_key)
+        except ClientError:
+            logger.warning("⚠️ Avatar not found in bucket: %s", object_key)
+            return False
+        return (
+            head.get("ContentLength", 0) <= AVATAR_MAX_BYTES
+            and head.get("ContentType", "").startswith("image/")
+        )
 
 # Replace singleton
 hetzner_storage = HetznerAvatarStorage()  
 
+# Avatar deletes are queued and flushed in batches by avatar_delete_worker (started by the app lifespan)
+AVATAR_DELETE_BATCH_WINDOW = 0.5
+_avatar_delete_queue = asyncio.Queue()
+
+def queue_avatar_delete(object_key: str):
+    """Schedule an avatar for deletion in the next DeleteObjects batch (returns immediately)"""
+    _avatar_delete_queue.put_nowait(object_key)
+
+def _drain_avatar_delete_queue(keys: list) -> list:
+    while not _avatar_delete_queue.empty():
+        keys.append(_avatar_delete_queue.get_nowait())
+    return keys
+
+async def avatar_delete_worker():
+    """
+    Collect queued avatar keys for AVATAR_DELETE_BATCH_WINDOW seconds, then delete them
+    with one DeleteObjects call. Whatever is still queued at shutdown is flushed before exiting.
+    """
+    keys = []
+    try:
+        while True:
+            keys = [await _avatar_delete_queue.get()]
+            await asyncio.sleep(AVATAR_DELETE_BATCH_WINDOW)
+            await asyncio.to_thread(hetzner_storage.delete_avatars, _drain_avatar_delete_queue(keys))
+            keys = []
+    except asyncio.CancelledError:
+        keys = _drain_avatar_delete_queue(keys)
+        if keys:
+            hetzner_storage.delete_avatars(keys)
+        raise
+
 
 def serialize_agent_data(agent: dict) -> dict:
     """